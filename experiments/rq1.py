@@ -1,9 +1,11 @@
 import numpy as np
+import pandas as pd
 import os
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
 from scipy.stats import spearmanr
 import scienceplots
+from utils.frames import results_frame, encoding_variables, encoding_total, PUZZLE_KEY
 
 plt.style.use(['science','ieee'])
 
@@ -61,103 +63,61 @@ SOLVER_LINE_STYLES = {
     "qf_ia_tree_c": "-."
 }
 
-def _summarize_runtime_scaling(results: list) -> list:
+def _summarize_runtime_scaling(results: list|pd.DataFrame) -> list:
     """ Create a summary of the runtime statistics
 
     Args:
-        results (list): Results to be analysed
+        results (list | pd.DataFrame): Results to be analysed
 
     Returns:
         list: Summary of runtime statistics
     """
-    # Sort by puzzle
-    by_puzzle = {}
-    for r in results:
-        key = (r["solver"], r["size"], r["puzzle"])
-        if key not in by_puzzle:
-            by_puzzle[key] = []
-        by_puzzle[key].append(r["statistics"]["runtime"])
-
-    # Flatten the puzzles with multiple runs
-    per_puzzle = []
-    for (solver, size, _), times in by_puzzle.items():
-        per_puzzle.append((solver, size, np.median(times)))
-
-    # Sort by puzzle size
-    by_size = {}
-    for (solver, size, runtime) in per_puzzle:
-        key = (solver, size)
-        if key not in by_size:
-            by_size[key] = []
-        by_size[key].append(runtime)
-
-    summary = []
-    for (solver, size), runtimes in by_size.items():
-        times = np.array(runtimes)
-        summary.append({
-            "solver": solver,
-            "size": size,
-            "runs": len(times),
-            "median": float(np.median(times)),
-            "mean": float(np.mean(times)),
-            "std": float(np.std(times)),
-            "q1": float(np.percentile(times, 25)),
-            "q3": float(np.percentile(times, 75))
-        })
-    
-    return sorted(summary, key=lambda x: (x["size"], x["solver"]))
+    frame = results_frame(results)
+
+    # Flatten the puzzles with multiple runs, then group by puzzle size
+    per_puzzle = frame.groupby(PUZZLE_KEY, sort=False)["statistics.runtime"].median()
+    by_size = per_puzzle.groupby(["solver", "size"])
+
+    summary = pd.DataFrame({
+        "runs": by_size.size(),
+        "median": by_size.median(),
+        "mean": by_size.mean(),
+        "std": by_size.std(ddof=0),
+        "q1": by_size.quantile(0.25),
+        "q3": by_size.quantile(0.75)
+    }).reset_index()
+
+    return summary.sort_values(["size", "solver"]).to_dict("records")
 
-def _summarize_encoding_scaling(results: list) -> list:
+def _summarize_encoding_scaling(results: list|pd.DataFrame) -> list:
     """ Create a summary of the encoding size statistics
 
     Args:
-        results (list): Results to be analysed
+        results (list | pd.DataFrame): Results to be analysed
 
     Returns:
         list: A summary of the encoding size statistics
     """
-    # Sort by puzzle
-    by_puzzle = {}
-    for r in results:
-        key = (r["solver"], r["size"], r["puzzle"])
-        if key not in by_puzzle:
-            by_puzzle[key] = {"variables": [], "assertions": []}
-        
-        encoding_size = r["statistics"]["encoding_size"]
-        total_variables = sum(v for k, v in encoding_size.items() if k != "assertions")
-        by_puzzle[key]["variables"].append(total_variables)
-        by_puzzle[key]["assertions"].append(encoding_size["assertions"])
-
-    # Flatten multiple runs into single values
-    per_puzzle = []
-    for (solver, size, _), values in by_puzzle.items():
-        per_puzzle.append((solver, size, float(np.median(values["variables"])), float(np.median(values["assertions"]))))
-
-    # Sort by size
-    by_size = {}
-    for (solver, size, variables, assertions) in per_puzzle:
-        key = (solver, size)
-        if key not in by_size:
-            by_size[key] = {"variables": [], "assertions": []}
-        by_size[key]["variables"].append(variables)
-        by_size[key]["assertions"].append(assertions)
-
-    summary = []
-    for (solver, size), values in by_size.items():
-        summary.append({
-            "solver": solver,
-            "size": size,
-            "variables": np.median(values["variables"]),
-            "assertions": np.median(values["assertions"]),
-        })
-
-    return sorted(summary, key=lambda x: (x["size"], x["solver"]))
-
-def plot_runtime_vs_size(results: list, solver_order: list) -> None:
+    frame = results_frame(results)
+    encoding = pd.DataFrame({
+        "solver": frame["solver"],
+        "size": frame["size"],
+        "puzzle": frame["puzzle"],
+        "variables": encoding_variables(frame),
+        "assertions": frame["statistics.encoding_size.assertions"]
+    })
+
+    # Flatten multiple runs into single values, then group by size
+    per_puzzle = encoding.groupby(PUZZLE_KEY, sort=False)[["variables", "assertions"]].median()
+    summary = per_puzzle.groupby(["solver", "size"]).median().reset_index()
+
+    return summary.sort_values(["size", "solver"]).to_dict("records")
+
+def plot_runtime_vs_size(results: list|pd.DataFrame, solver_order: list) -> None:
     """ Plot the median runtime per puzzle size
 
     Args:
-        results (list): Results with runtime satistics
+        results (list | pd.DataFrame): Results with runtime satistics
         solver_order (list): Order of the solvers to be plotted to make sure the legend stays the same across experiments
     """
     summary = _summarize_runtime_scaling(results)
@@ -196,11 +156,11 @@ def plot_runtime_vs_size(results: list, solver_order: list) -> None:
     plt.close()
     print(f"Saved {out_path}")
 
-def plot_encoding_scaling(results: list, solver_order: list) -> None:
+def plot_encoding_scaling(results: list|pd.DataFrame, solver_order: list) -> None:
     """ Plot the median runtime per puzzle size
 
     Args:
-        results (list): Results with encoding size satistics
+        results (list | pd.DataFrame): Results with encoding size satistics
         solver_order (list): Order of the solvers to be plotted to make sure the legend stays the same across experiments
     """
     summary = _summarize_encoding_scaling(results)
@@ -239,11 +199,11 @@ def plot_encoding_scaling(results: list, solver_order: list) -> None:
     plt.close()
     print(f"Saved {out_path}")
 
-def print_rq1_text_stats(results: list, baseline_solver: str = "qf_ia", report_sizes: list|None = None) -> None:
+def print_rq1_text_stats(results: list|pd.DataFrame, baseline_solver: str = "qf_ia", report_sizes: list|None = None) -> None:
     """ Prints the statistics used in RQ1
 
     Args:
-        results (list): Results from the experiments
+        results (list | pd.DataFrame): Results from the experiments
         baseline_solver (str, optional): Name of the solver to be used as baseline. Defaults to "qf_ia".
         report_sizes (list | None, optional): Sizes to report in the summary. Defaults to None.
 
@@ -348,11 +308,11 @@ def print_rq1_text_stats(results: list, baseline_solver: str = "qf_ia", report_s
         r2 = 1.0-(ss_res/ss_tot) if ss_tot > 0 else float("nan")
         print(f" {s:>12}: a={a:.4g} | b={b:.4g} | R^2={r2:.3g}")
 
-def print_encoding_text_stats(results: list, report_sizes: list|None = None) -> None:
+def print_encoding_text_stats(results: list|pd.DataFrame, report_sizes: list|None = None) -> None:
     """ Prints the encoding statistics used in RQ1
 
     Args:
-        results (list): Results from the experiments
+        results (list | pd.DataFrame): Results from the experiments
         report_sizes (list | None, optional): which sizes to print. If None, prints min/mid/max sizes in data.
     """
     enc_summary = _summarize_encoding_scaling(results)
@@ -376,31 +336,17 @@ def print_encoding_text_stats(results: list, report_sizes: list|None = None) ->
             total = row["variables"] + row["assertions"]
             print(f" {s:>12}: total={total} | vars={row['variables']} | assertions={row['assertions']}")
     
-    # Collect the encoding size and runtime per puzzle
-    by_puzzle = {}
-    for r in results:
-        key = (r["solver"], r["size"], r["puzzle"])
-        if key not in by_puzzle:
-            by_puzzle[key] = {"runtimes": [], "enc_sizes": []}
-        by_puzzle[key]["runtimes"].append(r["statistics"]["runtime"])
-
-        enc_stats = r["statistics"]["encoding_size"]
-        total_variables = sum(y for x, y in enc_stats.items() if x != "assertions")
-        total_enc_size = float(total_variables+enc_stats["assertions"])
-        by_puzzle[key]["enc_sizes"].append(total_enc_size)
-
-    # Flatten the runtimes and encoding sizes in case of multiple runs
-    xs = {}
-    ys = {}
-    for (solver, _, _), values in by_puzzle.items():
-        runtimes = float(np.median(values["runtimes"]))
-        enc_sizes = float(np.median(values["enc_sizes"]))
-        if solver not in xs:
-            xs[solver] = []
-        if solver not in ys:
-            ys[solver] = []
-        xs[solver].append(runtimes)
-        ys[solver].append(enc_sizes)
+    # Collect the encoding size and runtime per puzzle, flattening the runtimes and encoding sizes in case of multiple runs
+    frame = results_frame(results)
+    per_puzzle = pd.DataFrame({
+        "solver": frame["solver"],
+        "size": frame["size"],
+        "puzzle": frame["puzzle"],
+        "runtime": frame["statistics.runtime"],
+        "encoding": encoding_total(frame)
+    }).groupby(PUZZLE_KEY, sort=False)[["runtime", "encoding"]].median().reset_index()
+    xs = {solver: group["runtime"].to_numpy() for solver, group in per_puzzle.groupby("solver")}
+    ys = {solver: group["encoding"].to_numpy() for solver, group in per_puzzle.groupby("solver")}
     
     # Calculate the spearman correlation coefficient between runtime and encoding size
     for solver in sorted(xs.keys()):
@@ -1,12 +1,14 @@
 import numpy as np
 import scipy.stats
+import warnings
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
-from copy import deepcopy
+import pandas as pd
 import os
 from matplotlib.colors import ListedColormap, BoundaryNorm, TwoSlopeNorm
 import matplotlib.patches as patches
 import scienceplots
+from utils.frames import results_frame, median_per_puzzle, aggregate_runs, encoding_total, ENCODING_COLUMNS, PUZZLE_KEY
 
 plt.style.use(['science','ieee'])
 
@@ -45,48 +47,30 @@ colors = ["#D62728", "#006BA4", "#8C564B", "#2CA02C", "#7B4EA3", "#FF800E", "#E4
 
 LINE_STYLES = ["-", "--", "-.", ":"]
 
-def _flatten_results(results: list) -> list:
+def _flatten_results(results: list|pd.DataFrame) -> pd.DataFrame:
     """ Flattens the results from multiple runs into a single value
 
     Args:
-        results (list): Results from the experiments
+        results (list | pd.DataFrame): Results from the experiments
 
     Returns:
-        list: A flattened list of the results
+        pd.DataFrame: A flattened frame of the results, with the median runtime and encoding sizes per puzzle
     """
-    grouped = {}
-    for r in results:
-        key = (r["solver"], r["size"], r["puzzle"])
-        if key not in grouped:
-            grouped[key] = []
-        grouped[key].append(r)
-    
-    flattened = []
-    for (_, _, _), rs in grouped.items():
-        base = deepcopy(rs[0])
-        runtimes = [float(r["statistics"]["runtime"]) for r in rs]
-        base["statistics"]["runtime"] = float(np.median(runtimes))
-
-        encoding_keys = rs[0]["statistics"]["encoding_size"]
-        for key in encoding_keys.keys():
-            values = [float(r["statistics"]["encoding_size"][key]) for r in rs]
-            if values:
-                base["statistics"]["encoding_size"][key] = float(np.median(values))
-        flattened.append(base)
-    return flattened
-
-def _encoding_total(result: dict) -> int:
+    if isinstance(results, pd.DataFrame):
+        return median_per_puzzle(results, ["statistics.runtime"] + ENCODING_COLUMNS)
+    # Lists of results are folded before building a frame, so only one row per puzzle is converted
+    return results_frame(aggregate_runs(results))
+
+def _encoding_total(results: pd.DataFrame) -> pd.Series:
     """ Counts the total encoding size
 
     Args:
-        result (dict): Results for which we want to count the encoding size.
+        results (pd.DataFrame): Results for which we want to count the encoding size.
 
     Returns:
-        int: The number for the encoding size
+        pd.Series: The number for the encoding size of every result
     """
-    encoding = result["statistics"]["encoding_size"]
-    vars = sum(encoding[k] for k in encoding.keys() if k != "assertions")
-    return int(vars+encoding["assertions"])
+    return np.trunc(encoding_total(results)).astype("int64")
 
 def _short_label(name: str, baseline: str) -> str:
     """ Get the name of the solver without the baseline part
@@ -136,57 +120,101 @@ def _order_constraints(matrix: dict, relevance: dict, baseline: str) -> list:
         return (rank, -k, -faster, -slower, _short_label(constraint, baseline))
     return sorted(matrix.keys(), key=key)
 
-def _pair_by_size(results: list, size: int, this_name: str, that_name: str) -> tuple:
-    """ Gather all runtimes for the same puzzle ran by two solvers, within a single puzzle size
+def _build_index(results: pd.DataFrame) -> dict:
+    """ Build a dense index of the flattened results, so pairings do not have to scan all results
 
     Args:
-        results (list): Results from the experiments
-        size (int): Puzzle size to pair
-        this_name (str): One of the solvers to pair
-        that_name (str): The other solver to pair
+        results (pd.DataFrame): Flattened results from the experiments
 
     Returns:
-        tuple: Tuple containing two lists of runtimes from each of the solvers
+        dict: The sorted solvers, sizes and puzzles, with the median runtime and encoding total shaped (solver, size, puzzle), NaN where there is no result
     """
-    this = {}
-    that = {}
-
-    for r in results:
-        if r["size"] != size:
-            continue
-        puzzle = r["puzzle"]
-        solver = r["solver"]
-        if solver == this_name:
-            this[puzzle] = r["statistics"]["runtime"]
-        elif solver == that_name:
-            that[puzzle] = r["statistics"]["runtime"]
-    
-    # Filter out puzzles that are not in both sets
-    common = sorted(set(this.keys()) & set(that.keys()))
-    if not common:
-        return np.array([], dtype=float), np.array([], dtype=float)
-    
-    this_common = np.array([this[p] for p in common], dtype=float)
-    that_common = np.array([that[p] for p in common], dtype=float)
-    return this_common, that_common
+    solvers = sorted(set(results["solver"]))
+    sizes = sorted(set(results["size"]))
+    puzzles = sorted(set(results["puzzle"]))
+    position = (
+        pd.Index(solvers).get_indexer(results["solver"]),
+        pd.Index(sizes).get_indexer(results["size"]),
+        pd.Index(puzzles).get_indexer(results["puzzle"])
+    )
 
-def _pair_median_runtime_by_size(results: list, size: int, baseline: str, solver: str) -> tuple[float, float, int]:
-    """ Get the median runtimes from a paired group of solvers
+    runtime = np.full((len(solvers), len(sizes), len(puzzles)), np.nan)
+    encoding = np.full((len(solvers), len(sizes), len(puzzles)), np.nan)
+    runtime[position] = results["statistics.runtime"].to_numpy(dtype=float)
+    encoding[position] = _encoding_total(results).to_numpy(dtype=float)
+    return {"solvers": solvers, "sizes": sizes, "puzzles": puzzles, "runtime": runtime, "encoding": encoding}
+
+def _index_values(index: dict, key: str, solver: str, sizes: list) -> np.ndarray:
+    """ Get the values of a solver from the index for a selection of sizes
 
     Args:
-        results (list): Results from the experiments
-        size (int): Puzzle size to pair
+        index (dict): Index of the flattened results
+        key (str): Values to get, either runtime or encoding
+        solver (str): Solver to get the values of
+        sizes (list): Puzzle sizes to get the values of
+
+    Returns:
+        np.ndarray: Values shaped (size, puzzle), NaN for missing solvers, sizes and puzzles
+    """
+    values = np.full((len(sizes), len(index["puzzles"])), np.nan)
+    if solver not in index["solvers"]:
+        return values
+    i = index["solvers"].index(solver)
+    for j, n in enumerate(sizes):
+        if n in index["sizes"]:
+            values[j] = index[key][i, index["sizes"].index(n)]
+    return values
+
+def _default_selection(index: dict, baseline: str, constraints: list|None, sizes: list|None) -> tuple[list, list]:
+    """ Fill in the constraints and sizes from the index when they are not given
+
+    Args:
+        index (dict): Index of the flattened results
+        baseline (str): Baseline solver used in the experiments
+        constraints (list | None): List of constraints added on top of the baseline
+        sizes (list | None): Puzzle sizes used in the experiments
+
+    Returns:
+        tuple[list, list]: Constraints and sizes
+    """
+    if constraints is None:
+        constraints = [solver for solver in index["solvers"] if solver != baseline]
+    if sizes is None:
+        sizes = list(index["sizes"])
+    return constraints, sizes
+
+def _paired_runtimes(index: dict, baseline: str, constraints: list, sizes: list) -> tuple[np.ndarray, np.ndarray]:
+    """ Pair the runtimes of every constraint with those of the baseline on the same puzzles
+
+    Args:
+        index (dict): Index of the flattened results
         baseline (str): Baseline solver to be paired with
-        solver (str): Other solver to pair with the baseline
+        constraints (list): Other solvers to pair with the baseline
+        sizes (list): Puzzle sizes to pair
 
     Returns:
-        tuple[float, float, int]: _description_
+        tuple[np.ndarray, np.ndarray]: Runtimes of the baseline and of the constraints shaped (constraint, size, puzzle), NaN where either has no result
     """
-    base, other = _pair_by_size(results, size, baseline, solver)
-    # If the base list is empty, there were no equal puzzles between the sets
-    if len(base) == 0:
-        return (float("nan"), float("nan"), 0)
-    return (float(np.median(base)), float(np.median(other)), int(len(base)))
+    base = _index_values(index, "runtime", baseline, sizes)
+    other = np.stack([_index_values(index, "runtime", c, sizes) for c in constraints]) if constraints else np.empty((0, len(sizes), len(index["puzzles"])))
+    paired = ~np.isnan(base) & ~np.isnan(other)
+    return np.where(paired, base, np.nan), np.where(paired, other, np.nan)
+
+def _pair_by_size(index: dict, size: int, this_name: str, that_name: str) -> tuple:
+    """ Gather all runtimes for the same puzzle ran by two solvers, within a single puzzle size
+
+    Args:
+        index (dict): Index of the flattened results
+        size (int): Puzzle size to pair
+        this_name (str): One of the solvers to pair
+        that_name (str): The other solver to pair
+
+    Returns:
+        tuple: Tuple containing two lists of runtimes from each of the solvers
+    """
+    this, that = _paired_runtimes(index, this_name, [that_name], [size])
+    common = ~np.isnan(this[0, 0])
+    return this[0, 0][common], that[0, 0][common]
 
 def _holm_correction(p_values: dict, alpha: float) -> dict:
     """ Use holm correction to filter out significant values per size within a constraint
@@ -263,11 +291,11 @@ def _significance_grid(matrix: dict, relevance: dict, baseline: str) -> tuple:
     constraint_labels = [_short_label(c, baseline) for c in constraint_order]
     return constraint_order, constraint_labels, size_order, grid
 
-def _wilcoxon_by_constraint(results: list, baseline: str, constraints: list|None, sizes: list|None) -> dict:
-    """ Calculate the Wilcoxon signed-rank test per constraint per puzzle size
+def _wilcoxon_by_constraint(index: dict, baseline: str, constraints: list|None, sizes: list|None) -> dict:
+    """ Calculate the Wilcoxon signed-rank test per constraint per puzzle size, vectorised over all constraints and sizes
 
     Args:
-        results (list): Results from the experiments
+        index (dict): Index of the flattened results
         baseline (str): Baseline used in the experiments
         constraints (list | None): List of constraints added on top of the baseline
         sizes (list | None): Puzzle sizes used in the experiments
@@ -275,34 +303,48 @@ def _wilcoxon_by_constraint(results: list, baseline: str, constraints: list|None
     Returns:
         dict: A matrix of p-values per constraint per puzzle size
     """
-    if constraints is None:
-        constraints = sorted({r["solver"] for r in results if r["solver"] != baseline})
-    if sizes is None:
-        sizes = sorted({r["size"] for r in results})
-    
+    constraints, sizes = _default_selection(index, baseline, constraints, sizes)
+    s1, s2 = _paired_runtimes(index, baseline, constraints, sizes)
+    pairs = np.sum(~np.isnan(s1), axis=-1)
+    difference = s2-s1
+    # The vectorised test raises for the whole array as soon as a single pairing has too few non-zero differences,
+    # so those pairings are tested one by one, as the test may still be undefined for them
+    degenerate = np.sum(np.nan_to_num(difference) != 0, axis=-1) < 2
+    p_values = np.full(pairs.shape, np.nan)
+
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        # Empty pairings give NaN, they are reported without a test below
+        warnings.simplefilter("ignore")
+        median_difference = np.nanmedian(difference, axis=-1)
+        tested = ~degenerate & (pairs > 0)
+        if tested.any():
+            p_values[tested] = scipy.stats.wilcoxon(s1[tested], s2[tested], axis=-1, nan_policy="omit").pvalue
+        for i, j in zip(*np.nonzero(degenerate & (pairs > 0))):
+            paired = ~np.isnan(s1[i, j])
+            try:
+                p_values[i, j] = scipy.stats.wilcoxon(s1[i, j][paired], s2[i, j][paired]).pvalue
+            except ValueError:
+                pass
+
     matrix = {c: {} for c in constraints}
-    for c in constraints:
-        for n in sizes:
-            s1, s2 = _pair_by_size(results, n, baseline, c)
-            if len(s1) == 0 or len(s2) == 0:
+    for i, c in enumerate(constraints):
+        for j, n in enumerate(sizes):
+            if pairs[i, j] == 0:
                 matrix[c][n] = (np.nan, 0)
                 continue
 
-            difference  = s2-s1
-            median_difference = float(np.median(difference))
             direction = 0
-            if median_difference < 0:
+            if median_difference[i, j] < 0:
                 direction = 1
-            elif median_difference > 0:
+            elif median_difference[i, j] > 0:
                 direction = -1
-            
-            try:
-                stat = scipy.stats.wilcoxon(s1, s2)
-                p = float(stat.pvalue)
-            except ValueError:
+
+            p = float(p_values[i, j])
+            # The test is undefined for this pairing
+            if np.isnan(p):
                 p = 1.0
                 direction = 0
-            
+
             matrix[c][n] = (p, direction)
     return matrix
 
@@ -379,11 +421,11 @@ def _plot_significance_heatmap(constraint_labels: list, size_order: list, signif
     plt.close(fig)
     print(f"Saved {out_path}")
 
-def _summarize_speedup_by_constraint(results: list, baseline: str, constraints: list|None = None, sizes: list|None = None) -> dict:
+def _summarize_speedup_by_constraint(index: dict, baseline: str, constraints: list|None = None, sizes: list|None = None) -> dict:
     """ Summarize the total speedup gained per constraint against the baseline solver
 
     Args:
-        results (list): Results from the experiments
+        index (dict): Index of the flattened results
         baseline (str): Baseline solver used in the experiments
         constraints (list | None, optional): List of constraints used in the experiments. Defaults to None.
         sizes (list | None, optional): Puzzle sizes used in the experiments. Defaults to None.
@@ -391,16 +433,19 @@ def _summarize_speedup_by_constraint(results: list, baseline: str, constraints:
     Returns:
         dict: A dictionary containing speedup statistics compared to the baseline for each constraint per puzzle size
     """
-    if constraints is None:
-        constraints = sorted({r["solver"] for r in results if r["solver"] != baseline})
-    if sizes is None:
-        sizes = sorted({r["size"] for r in results})
+    constraints, sizes = _default_selection(index, baseline, constraints, sizes)
+    base, other = _paired_runtimes(index, baseline, constraints, sizes)
+    pairs = np.sum(~np.isnan(base), axis=-1)
+    with warnings.catch_warnings():
+        # Sizes without pairs have a NaN median
+        warnings.simplefilter("ignore")
+        base_medians = np.nanmedian(base, axis=-1)
+        constraint_medians = np.nanmedian(other, axis=-1)
 
     out = {c: {} for c in constraints}
-
-    for c in constraints:
-        for n in sizes:
-            base_med, constraint_med, num_pairs = _pair_median_runtime_by_size(results, n, baseline, c)
+    for i, c in enumerate(constraints):
+        for j, n in enumerate(sizes):
+            num_pairs, base_med, constraint_med = int(pairs[i, j]), float(base_medians[i, j]), float(constraint_medians[i, j])
             if num_pairs == 0 or constraint_med <= 0:
                 out[c][n] = {
                     "pairs": num_pairs,
@@ -421,11 +466,11 @@ def _summarize_speedup_by_constraint(results: list, baseline: str, constraints:
 
     return out
 
-def _summarize_encoding_ratio_by_constraint(results: list, baseline: str, constraints: list|None = None, sizes: list|None = None) -> dict:
+def _summarize_encoding_ratio_by_constraint(index: dict, baseline: str, constraints: list|None = None, sizes: list|None = None) -> dict:
     """ Summarize the encoding size ratios based on the baseline for each redundant constraint added
 
     Args:
-        results (list): Results from the experiments
+        index (dict): Index of the flattened results
         baseline (str): Baseline solver used in the experiments
         constraints (list | None, optional): List of constraints used in the experiments. Defaults to None.
         sizes (list | None, optional): Puzzle sizes used in the experiments. Defaults to None.
@@ -433,32 +478,21 @@ def _summarize_encoding_ratio_by_constraint(results: list, baseline: str, constr
     Returns:
         dict: Dictionary containing the ratios of encoding sizes for all constraint compared to the baseline
     """
-    if constraints is None:
-        constraints = sorted({r["solver"] for r in results if r["solver"] != baseline})
-    if sizes is None:
-        sizes = sorted({r["size"] for r in results})
-
-    totals = {}
-    for result in results:
-        solver = result["solver"]
-        n = result["size"]
-        if solver != baseline and solver not in constraints:
-            continue
-        if n not in sizes:
-            continue
-        totals.setdefault(solver, {}).setdefault(n, []).append(_encoding_total(result))
+    constraints, sizes = _default_selection(index, baseline, constraints, sizes)
+    with warnings.catch_warnings():
+        # Sizes without results have a NaN median
+        warnings.simplefilter("ignore")
+        totals = {solver: np.nanmedian(_index_values(index, "encoding", solver, sizes), axis=-1) for solver in [baseline] + list(constraints)}
 
     out = {constraint: {} for constraint in constraints}
     for constraint in constraints:
-        for n in sizes:
-            base_list = totals[baseline][n]
-            constraint_list = totals[constraint][n]
-            if not base_list or not constraint_list:
+        for j, n in enumerate(sizes):
+            if np.isnan(totals[baseline][j]) or np.isnan(totals[constraint][j]):
                 out[constraint][n] = {"baseline_total": None, "solver_total": None, "ratio": float("nan")}
                 continue
 
-            base_med = int(np.median(np.array(base_list, dtype=float)))
-            constraint_med = int(np.median(np.array(constraint_list, dtype=float)))
+            base_med = int(totals[baseline][j])
+            constraint_med = int(totals[constraint][j])
             ratio = float(constraint_med/base_med) if base_med > 0 else float("nan")
 
             out[constraint][n] = {"baseline_total": base_med, "solver_total": constraint_med, "ratio": ratio}
@@ -581,53 +615,32 @@ def _plot_speedup_heatmap(constraint_labels: list, size_order: list, speedup_gri
     plt.close(fig)
     print(f"Saved {out_path}")
 
-def _summarize_runtime(results: list) -> list:
+def _summarize_runtime(results: list|pd.DataFrame) -> list:
     """ Create a summary of the runtime statistics
 
     Args:
-        results (list): Results to be analysed
+        results (list | pd.DataFrame): Results to be analysed
 
     Returns:
         list: Summary of runtime statistics
     """
-    # Sort by puzzle
-    by_puzzle = {}
-    for r in results:
-        key = (r["solver"], r["size"], r["puzzle"])
-        if key not in by_puzzle:
-            by_puzzle[key] = []
-        by_puzzle[key].append(r["statistics"]["runtime"])
-
-    # Flatten the puzzles with multiple runs
-    per_puzzle = []
-    for (solver, size, _), times in by_puzzle.items():
-        per_puzzle.append((solver, size, np.median(times)))
-
-    # Sort by puzzle size
-    by_size = {}
-    for (solver, size, runtime) in per_puzzle:
-        key = (solver, size)
-        if key not in by_size:
-            by_size[key] = []
-        by_size[key].append(runtime)
-
-    summary = []
-    for (solver, size), runtimes in by_size.items():
-        times = np.array(runtimes)
-        summary.append({
-            "solver": solver,
-            "size": size,
-            "runs": len(times),
-            "median": float(np.median(times)),
-        })
+    frame = results_frame(results)
+
+    # Flatten the puzzles with multiple runs, then group by puzzle size
+    per_puzzle = frame.groupby(PUZZLE_KEY, sort=False)["statistics.runtime"].median()
+    by_size = per_puzzle.groupby(["solver", "size"])
+    summary = pd.DataFrame({
+        "runs": by_size.size(),
+        "median": by_size.median(),
+    }).reset_index()
     
-    return sorted(summary, key=lambda x: (x["size"], x["solver"]))
+    return summary.sort_values(["size", "solver"]).to_dict("records")
 
-def _plot_runtime_per_size(results: list, baseline: str, constraints: list, sizes: list) -> None:
+def _plot_runtime_per_size(results: list|pd.DataFrame, baseline: str, constraints: list, sizes: list) -> None:
     """ Create a plot of a selection of constraints for a selection of sizes
 
     Args:
-        results (list): Results from the experiment
+        results (list | pd.DataFrame): Results from the experiment
         baseline (str): Baseline that was used to compare to
         constraints (list): Constraints to be plotted
         sizes (list): Puzzle sizes to be plotted
@@ -668,11 +681,11 @@ def _plot_runtime_per_size(results: list, baseline: str, constraints: list, size
     plt.close()
     print(f"Saved {out_path}")
 
-def run_wilcoxon(results: list, baseline: str, constraints: list|None = None, sizes: list|None = None, alpha: float = 0.05, print_results: bool = True) -> None:
+def run_wilcoxon(results: list|pd.DataFrame, baseline: str, constraints: list|None = None, sizes: list|None = None, alpha: float = 0.05, print_results: bool = True) -> None:
     """ Run the RQ2 analysis
 
     Args:
-        results (list): Results from the experiments
+        results (list | pd.DataFrame): Results from the experiments
         baseline (str): Baseline solver used in the experiments
         constraints (list | None, optional): Constraints used in the experiments. Defaults to None.
         sizes (list | None, optional): Puzzle sizes to be analysed. Defaults to None.
@@ -680,16 +693,20 @@ def run_wilcoxon(results: list, baseline: str, constraints: list|None = None, si
         print_results (bool, optional): Flag to indicate if we want to print the results to the CLI. Defaults to True.
     """
     flattened_results = _flatten_results(results)
-    p_matrix = _wilcoxon_by_constraint(flattened_results, baseline, constraints, sizes)
+    # All pairings and tests below read from a single index of the flattened results
+    index = _build_index(flattened_results)
+    constraints, sizes = _default_selection(index, baseline, constraints, sizes)
+    p_matrix = _wilcoxon_by_constraint(index, baseline, constraints, sizes)
     relevance_stats = _classify_constraints(p_matrix, alpha)
 
     constraint_order, constraint_labels, size_order, significance_grid = _significance_grid(p_matrix, relevance_stats, baseline)
     if print_results:
         _print_wolcoxon(relevance_stats)
     _plot_significance_heatmap(constraint_labels, size_order, significance_grid)
-    speedup = _summarize_speedup_by_constraint(flattened_results, baseline, constraints, sizes)
-    encoding_size_stats = _summarize_encoding_ratio_by_constraint(flattened_results, baseline, constraints, sizes)
+    speedup = _summarize_speedup_by_constraint(index, baseline, constraints, sizes)
+    encoding_size_stats = _summarize_encoding_ratio_by_constraint(index, baseline, constraints, sizes)
     constraint_labels2, size_order2, speedup_grid = _speedup_grid(constraint_order, size_order, speedup, relevance_stats, baseline)
     _plot_speedup_heatmap(constraint_labels2, size_order2, speedup_grid)
-    _plot_runtime_per_size(results, baseline, constraints, sizes)
+    # The runs are already flattened to their median, which the runtime summary would take per puzzle as well
+    _plot_runtime_per_size(flattened_results, baseline, constraints, sizes)
     print_constraint_summary(speedup, encoding_size_stats, sizes=size_order, baseline=baseline)
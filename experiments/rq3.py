@@ -1,50 +1,29 @@
+import os
 import math
+import json
+import hashlib
 import numpy as np
-from collections import Counter
-from utils.file_utils import read_puzzle
+from concurrent.futures import ProcessPoolExecutor
+from utils.file_utils import read_puzzle, puzzle_source, FEATURE_STORE_NAME
+from utils.frames import aggregate_runs
+from utils.effort import EFFORT_WEIGHTS, effort_score
 from scipy.stats import mannwhitneyu, false_discovery_control, spearmanr
 
-def _flatten_results(results: list) -> list:
+# Minimum number of puzzles without stored features before they are computed in a process pool
+PARALLEL_FEATURE_THRESHOLD = 64
+# Number of puzzles per batch of the feature kernel in a worker process
+FEATURE_CHUNK = 512
+
+def _flatten_results(results) -> list:
     """ Flatten the results from multiple runs
 
     Args:
-        results (list): Results from the experiments
+        results (iterable): Results from the experiments
 
     Returns:
         list: A flattened list of results
     """
-    by_puzzle = {}
-
-    for r in results:
-        key = (r["solver"], r["size"], r["puzzle"])
-        if key not in by_puzzle:
-            by_puzzle[key] = {
-                "solver": r["solver"],
-                "size": r["size"],
-                "path": r["path"],
-                "puzzle": r["puzzle"],
-                "puzzle_statistics": r["puzzle_statistics"],
-                "statistics": {
-                    "runtime": [],
-                    "decisions": [],
-                    "conflicts": [],
-                    "propagations": []
-                }
-            }
-        by_puzzle[key]["statistics"]["runtime"].append(r["statistics"]["runtime"])
-        by_puzzle[key]["statistics"]["decisions"].append(r["statistics"]["decisions"])
-        by_puzzle[key]["statistics"]["conflicts"].append(r["statistics"]["conflicts"])
-        by_puzzle[key]["statistics"]["propagations"].append(r["statistics"]["propagations"])
-
-    flattened = []
-    for r in by_puzzle.values():
-        statistics = r["statistics"]
-        median = {k: float(np.median(v)) if len(v) else 0.0 for k, v in statistics.items()}
-        r["statistics"] = median
-        r["runs"] = len(statistics["runtime"])
-        flattened.append(r)
-
-    return flattened
+    return aggregate_runs(results)
 
 def _build_groups(results: list, runtime_outliers: list, effort_outliers: list) -> tuple:
     """ Build groups of puzzles based on the outlier sets
@@ -113,22 +92,6 @@ def _iqr_whiskers(x: list, k: float = 1.5) -> tuple:
     iqr = q3-q1
     return q1-k*iqr, q3+k*iqr
 
-def _effort_score(r: dict, weights: dict) -> float:
-    """ Calculates an effort based score for the results
-
-    Args:
-        r (dict): Results from the experiments
-        weights (dict): Dict of weights for the effort statistics
-
-    Returns:
-        float: Effort score which is a weighted sum of statistics
-    """
-    return (
-        weights["decisions"]*math.log1p(r["statistics"]["decisions"])+
-        weights["conflicts"]*math.log1p(r["statistics"]["conflicts"])+
-        weights["propagations"]*math.log1p(r["statistics"]["propagations"])
-    )
-
 def _find_effort_outliers(results: list, weights: dict, k: float) -> list:
     """ Finds the outliers using the effort based method
 
@@ -140,7 +103,7 @@ def _find_effort_outliers(results: list, weights: dict, k: float) -> list:
     Returns:
         list: List of outliers in this set of results based on effort score
     """
-    scores = [(r, _effort_score(r, weights)) for r in results]
+    scores = [(r, effort_score(r, weights)) for r in results]
     values = [s for _, s in scores]
 
     if len(values) < 8:
@@ -167,122 +130,199 @@ def _find_runtime_outliers(results: list, k: float) -> list:
     _, upper = _iqr_whiskers(values, k)
     return [r for r in results if math.log1p(r["statistics"]["runtime"]) > upper]
 
-def _find_pairs_and_triplets(puzzle: list, n: int) -> tuple[int, int]:
-    """ Find the number of pairs and triplets in a puzzle
+# Columns of the feature matrix computed by the feature kernel, the feature store recomputes puzzles that miss a column
+FEATURE_COLUMNS = ["pair_duplicates", "triple_duplicates", "isolated_duplicates", "cross_duplicates", "duplicate_density", "runs_2", "runs_3", "runs_long"]
+# Feature columns that are not counts
+RATIO_COLUMNS = ["duplicate_density"]
+
+def _line_runs(stack: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Finds the runs of equal numbers along the rows of a stack of puzzles
 
     Args:
-        puzzle (list): Puzzle grid
-        n (int): Size of the puzzle
+        stack (np.ndarray): Puzzles shaped (K, n, n)
 
     Returns:
-        tuple[int, int]: Tuple containing the number of pairs and triplets
+        tuple[np.ndarray, np.ndarray]: Offset of every cell within its run, and the length of every run at its last cell (0 elsewhere)
     """
-    pairs = 0
-    triplets = 0
-    for i in range(n):
-        j = 0
-        while j < n-1:
-            if puzzle[i][j] == puzzle[i][j+1]:
-                if j < n-2 and puzzle[i][j] == puzzle[i][j+2]:
-                    triplets += 1
-                    j += 3
-                else:
-                    pairs += 1
-                    j += 2
-            else:
-                j += 1
-        j = 0
-        while j < n-1:
-            if puzzle[j][i] == puzzle[j+1][i]:
-                if j < n-2 and puzzle[j][i] == puzzle[j+2][i]:
-                    triplets += 1
-                    j += 3
-                else:
-                    pairs += 1
-                    j += 2
-            else:
-                j += 1
-    return pairs, triplets
-
-def _find_isolated(puzzle: list, n: int) -> int:
-    """ Finds the number of isolated duplicates in a puzzle
+    equal = stack[..., 1:] == stack[..., :-1]
+    start = np.ones(stack.shape, dtype=bool)
+    start[..., 1:] = ~equal
+    end = np.ones(stack.shape, dtype=bool)
+    end[..., :-1] = ~equal
+
+    index = np.broadcast_to(np.arange(stack.shape[-1]), stack.shape)
+    offset = index-np.maximum.accumulate(np.where(start, index, 0), axis=-1)
+    return offset, np.where(end, offset+1, 0)
+
+def _line_counts(stack: np.ndarray, values: int, mask: np.ndarray|None = None) -> np.ndarray:
+    """ Counts every number along the rows of a stack of puzzles
 
     Args:
-        puzzle (list): Puzzle grid
-        n (int): Size of the puzzle
+        stack (np.ndarray): Puzzles shaped (K, n, n)
+        values (int): Upper bound of the numbers in the puzzles
+        mask (np.ndarray | None, optional): Only count the cells set in this mask. Defaults to None.
 
     Returns:
-        int: The number of isolated duplicates
+        np.ndarray: Counts shaped (K, n, values)
     """
-    isolated = 0
-    for i in range(n):
-        row_map = {}
-        col_map = {}
-        k = 0
-        while k < n:
-            nk = k
-            if k < n-1 and puzzle[i][k] == puzzle[i][k+1]:
-                if k < n-2 and puzzle[i][k] == puzzle[i][k+2]:
-                    nk += 3
-                else:
-                    nk += 2
-            else:
-                nk += 1
-
-            v = puzzle[i][k]
-            row_map[v] = row_map.get(v, 0)+1
-            k = nk
-        
-        k = 0
-        while k < n:
-            nk = k
-            if k < n-1 and puzzle[k][i] == puzzle[k+1][i]:
-                if k < n-2 and puzzle[k][i] == puzzle[k+2][i]:
-                    nk += 3
-                else:
-                    nk += 2
-            else:
-                nk += 1
-
-            v = puzzle[k][i]
-            col_map[v] = col_map.get(v, 0)+1
-            k = nk
-        
-        for _, val in row_map.items():
-            if val > 1:
-                isolated += 1
-        for _, val in col_map.items():
-            if val > 1:
-                isolated += 1
-    return isolated
+    k, n, _ = stack.shape
+    index = np.arange(k*n).reshape(k, n, 1)*values+stack
+    index = index.ravel() if mask is None else index[mask]
+    return np.bincount(index, minlength=k*n*values).reshape(k, n, values)
 
-def _cross_duplicates(puzzle: list, n: int) -> int:
-    """ Number of entangled duplicates in the puzzle
+def _line_features(stack: np.ndarray, values: int) -> dict:
+    """ Computes the features along the rows of a stack of puzzles
 
     Args:
-        puzzle (list): Puzzle grid
-        n (int): Size of the puzzle
+        stack (np.ndarray): Puzzles shaped (K, n, n)
+        values (int): Upper bound of the numbers in the puzzles
 
     Returns:
-        int: Number of entangled duplicates
+        dict: Pairs, triplets, isolated duplicates and run histogram per puzzle, and the mask of cells duplicated in their row
     """
-    rows = [[False]*n for _ in range(n)]
-    cols = [[False]*n for _ in range(n)]
-
-    for i in range(n):
-        count = Counter(puzzle[i])
-        for j in range(n):
-            if count[puzzle[i][j]] > 1:
-                rows[i][j] = True
-
-    for i in range(n):
-        col = [puzzle[j][i] for j in range(n)]
-        count = Counter(col)
-        for j in range(n):
-            if count[puzzle[j][i]] > 1:
-                cols[j][i] = True
-    
-    return sum(1 for i in range(n) for j in range(n) if rows[i][j] and cols[i][j])        
+    offset, lengths = _line_runs(stack)
+    # Runs are split into triplets first, a remainder of two cells is a pair
+    pairs = np.sum(lengths%3 == 2, axis=(1, 2))
+    triplets = np.sum(lengths//3, axis=(1, 2))
+    # Pairs and triplets count as a single token, so only the first cell of every triplet within a run is kept
+    tokens = offset%3 == 0
+    isolated = np.sum(_line_counts(stack, values, tokens) > 1, axis=(1, 2))
+    duplicated = np.take_along_axis(_line_counts(stack, values), stack, axis=-1) > 1
+
+    return {
+        "pairs": pairs,
+        "triplets": triplets,
+        "isolated": isolated,
+        "duplicated": duplicated,
+        "histogram": [np.sum(lengths == 2, axis=(1, 2)), np.sum(lengths == 3, axis=(1, 2)), np.sum(lengths >= 4, axis=(1, 2))]
+    }
+
+def puzzle_feature_matrix(puzzles: np.ndarray) -> np.ndarray:
+    """ Computes the features of a stack of puzzles of the same size along both axes at once
+
+    Args:
+        puzzles (np.ndarray): Puzzles shaped (K, n, n)
+
+    Returns:
+        np.ndarray: Feature matrix shaped (K, len(FEATURE_COLUMNS)), row i holds the features of puzzle i
+    """
+    stack = np.asarray(puzzles, dtype=np.int64)
+    if stack.shape[0] == 0:
+        return np.empty((0, len(FEATURE_COLUMNS)))
+    values = int(stack.max())+1
+    rows = _line_features(stack, values)
+    cols = _line_features(stack.transpose(0, 2, 1), values)
+    row_duplicates = rows["duplicated"]
+    col_duplicates = cols["duplicated"].transpose(0, 2, 1)
+
+    return np.column_stack([
+        rows["pairs"]+cols["pairs"],
+        rows["triplets"]+cols["triplets"],
+        rows["isolated"]+cols["isolated"],
+        np.sum(row_duplicates & col_duplicates, axis=(1, 2)),
+        np.mean(row_duplicates | col_duplicates, axis=(1, 2)),
+        *[row+col for row, col in zip(rows["histogram"], cols["histogram"])]
+    ]).astype(float)
+
+def _feature_store_path(path: str) -> tuple[str, str]:
+    """ Finds the feature store of a puzzle and the name of the puzzle within it
+
+    Args:
+        path (str): Path to the puzzle
+
+    Returns:
+        tuple[str, str]: Path to the feature store and the name of the puzzle in the store
+    """
+    directory = os.path.dirname(os.path.abspath(puzzle_source(path)))
+    return os.path.join(directory, FEATURE_STORE_NAME), os.path.relpath(os.path.abspath(path), directory)
+
+def _load_feature_store(path: str) -> dict:
+    """ Loads a feature store from disk
+
+    Args:
+        path (str): Path to the feature store
+
+    Returns:
+        dict: Store mapping puzzle names to their modification time, size and content hash, and content hashes to their features
+    """
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            print(f"Warning: Ignoring unreadable feature store at {path}")
+    return {"files": {}, "features": {}}
+
+def _compute_features(paths: list) -> list:
+    """ Computes all features of a batch of puzzles, running the feature kernel once per puzzle size
+
+    Args:
+        paths (list): Paths to the puzzles
+
+    Returns:
+        list: Content hash and features of every puzzle, in the order of the paths
+    """
+    puzzles = [read_puzzle(path, False)[1] for path in paths]
+    by_size = {}
+    for i, puzzle in enumerate(puzzles):
+        by_size.setdefault(len(puzzle), []).append(i)
+
+    computed = [None]*len(paths)
+    for indices in by_size.values():
+        matrix = puzzle_feature_matrix(np.array([puzzles[i] for i in indices]))
+        for i, row in zip(indices, matrix.tolist()):
+            digest = hashlib.sha256(json.dumps(puzzles[i]).encode()).hexdigest()
+            computed[i] = (digest, {name: value if name in RATIO_COLUMNS else int(value) for name, value in zip(FEATURE_COLUMNS, row)})
+    return computed
+
+def puzzle_features(paths: list, workers: int|None = None) -> dict:
+    """ Gets the features of puzzles from the feature stores next to them, computing and storing missing ones
+        Puzzles that did not change since their features were stored are not read
+
+    Args:
+        paths (list): Paths to the puzzles
+        workers (int | None, optional): Number of worker processes for missing features, the number of cores if None. Defaults to None.
+
+    Returns:
+        dict: Features per path
+    """
+    stores = {}
+    located = {}
+    missing = []
+    for path in dict.fromkeys(paths):
+        store_path, name = _feature_store_path(path)
+        if store_path not in stores:
+            stores[store_path] = _load_feature_store(store_path)
+        store = stores[store_path]
+
+        st = os.stat(puzzle_source(path))
+        entry = store["files"].get(name)
+        located[path] = (store_path, name, [st.st_mtime_ns, st.st_size])
+        if entry is None or entry[:2] != located[path][2] or not set(FEATURE_COLUMNS) <= store["features"].get(entry[2], {}).keys():
+            missing.append(path)
+
+    if len(missing) >= PARALLEL_FEATURE_THRESHOLD:
+        chunks = [missing[i:i+FEATURE_CHUNK] for i in range(0, len(missing), FEATURE_CHUNK)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = [features for chunk in executor.map(_compute_features, chunks) for features in chunk]
+    else:
+        computed = _compute_features(missing)
+
+    changed = set()
+    for path, (digest, features) in zip(missing, computed):
+        store_path, name, key = located[path]
+        stores[store_path]["files"][name] = key + [digest]
+        stores[store_path]["features"].setdefault(digest, {}).update(features)
+        changed.add(store_path)
+    for store_path in changed:
+        with open(store_path, "w", encoding="utf-8") as f:
+            json.dump(stores[store_path], f)
+
+    result = {}
+    for path, (store_path, name, _) in located.items():
+        store = stores[store_path]
+        result[path] = store["features"][store["files"][name][2]]
+    return result
 
 def analyze_puzzle_statistics(results: list) -> dict:
     """ Analyses a puzzle for certain patterns and statistics
@@ -293,10 +333,11 @@ def analyze_puzzle_statistics(results: list) -> dict:
     Returns:
         dict: A dict containing the statistics per puzzle per size
     """
+    features = puzzle_features([r["path"] for r in results])
+
     puzzle_dict = {}
     for r in results:
         path = r["path"]
-        (_, puzzle, _) = read_puzzle(path, False)
         fname = r["puzzle"]
         n = r["size"]
         if n not in puzzle_dict:
@@ -304,15 +345,7 @@ def analyze_puzzle_statistics(results: list) -> dict:
         
         stats = {}
         stats["path"] = path
-
-        pairs, triplets = _find_pairs_and_triplets(puzzle, n)
-        isolated = _find_isolated(puzzle, n)
-        cross_duplicates = _cross_duplicates(puzzle, n)
-
-        stats["pair_duplicates"] = pairs
-        stats["triple_duplicates"] = triplets
-        stats["isolated_duplicates"] = isolated
-        stats["cross_duplicates"] = cross_duplicates
+        stats.update(features[path])
         stats["black_cells"] = r["puzzle_statistics"]["black_cells"]
         puzzle_dict[n][fname] = stats
     return puzzle_dict
@@ -341,15 +374,10 @@ def run_all(results: list, solver: str = "qf_ia", k_out: float = 1.5, k_fout: fl
         k_out (float, optional): Scalar that is used for the IQR whiskers. Defaults to 1.5.
         k_fout (float, optional): Scalar that is used for the far-out IQR whiskers. Defaults to 3.0.
     """
-    results = [r for r in results if r["solver"] == solver]
-    results = _flatten_results(results)
+    results = _flatten_results(r for r in results if r["solver"] == solver)
     puzzle_statistics_by_size = analyze_puzzle_statistics(results)
     grouped = _group_by_size(results)
-    weights = {
-        "decisions": 1.0,
-        "conflicts": 0.7,
-        "propagations": 0.5,
-    }
+    weights = EFFORT_WEIGHTS
 
     # Gather outliers
     all_outliers_runtime = {}
@@ -419,7 +447,7 @@ def run_all(results: list, solver: str = "qf_ia", k_out: float = 1.5, k_fout: fl
     for size, result in sorted(grouped.items()):
         print(f"Size {size}x{size}")
 
-        effort_values = [_effort_score(r, weights) for r in result]
+        effort_values = [effort_score(r, weights) for r in result]
         runtime_values = [r["statistics"]["runtime"] for r in result]
 
         for feature in features:
@@ -1,5 +1,6 @@
+import os
 from clingo.control import Control
-from clingo import Model
+from clingo import Function, Number
 
 from typing import List
 
@@ -7,29 +8,42 @@ from typing import List
 This solver is a version of the ASP solver developed by Sappho de Nooij (https://github.com/sappho3)
 '''
 
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model.lp")
+
+# Persistent sessions per puzzle size, so every worker parses and grounds the rules only once per n
+_sessions = {}
+
+class _Session:
+    def __init__(self, n: int):
+        model = open(MODEL_PATH).read()
+        self.ctl = Control(["-c", f"n={n}"])
+        self.ctl.configuration.solve.models="2" # try to find at least 2 models
+        self.ctl.add("base", [], model)
+        # The cells of a candidate grid are supplied as external atoms instead of facts
+        self.ctl.add("base", [], "#external cell(X, Y, Z) : row(X), column(Y), number(Z).")
+        self.ctl.ground([("base", [])])
+        self.active = []
+
+    def solve(self, grid: List[List[int]]) -> tuple[bool, bool]:
+        # Only switch the externals that differ from the previous candidate
+        cells = [Function("cell", [Number(x + 1), Number(y + 1), Number(int(number))]) for y, row in enumerate(grid) for x, number in enumerate(row)]
+        for cell in set(self.active) - set(cells):
+            self.ctl.assign_external(cell, False)
+        for cell in cells:
+            self.ctl.assign_external(cell, True)
+        self.active = cells
+
+        num_models = 0
+        with self.ctl.solve(yield_=True) as handle:
+            for _ in handle:
+                num_models += 1
+
+        has_solution = num_models > 0
+        unique = num_models == 1
+        return has_solution, unique
+
 def solve(grid: List[List[int]]) -> tuple[bool, bool]:
     n = len(grid)
-
-    model = open("generator/model.lp").read()
-    ctl = Control(["-c", f"n={n}"])
-    ctl.configuration.solve.models="2" # try to find at least 2 models
-    ctl.add("base", [], model)
-
-    for y, row in enumerate(grid):
-        for x, number in enumerate(row):
-            ctl.add("base", [], f"cell({x + 1}, {y + 1}, {number}).");
-    ctl.ground([("base", [])])
-
-    global num_models
-    num_models = 0
-
-    def on_model(m: Model):
-        global num_models
-        num_models += 1
-
-    ctl.solve(on_model=on_model)
-
-    has_solution = num_models > 0
-    unique = num_models == 1
-    return has_solution, unique
-
+    if n not in _sessions:
+        _sessions[n] = _Session(n)
+    return _sessions[n].solve(grid)
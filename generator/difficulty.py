@@ -0,0 +1,104 @@
+import os
+import sys
+from z3 import *
+
+# Make the shared utilities of the repository available when running this script directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils.bitboard as bitboard
+from utils.effort import EFFORT_WEIGHTS, effort_score
+
+'''
+Incremental uniqueness and effort checks for difficulty-targeted generation.
+A single solver is kept per size: the neighbour rule and the connectivity cuts do not depend on the numbers,
+so they stay asserted, and only the duplicate constraints of a candidate are pushed and popped.
+'''
+
+# Timeout per check of the reused solver
+TIMEOUT_MS = 10000
+# Metrics that can be used as the effort of a puzzle
+METRICS = ["conflicts", "decisions", "effort"]
+
+# Reused checkers per puzzle size
+_checkers = {}
+
+class _Checker:
+    def __init__(self, n: int):
+        self.n = n
+        # The simple solver keeps cumulative statistics, so the effort of a check is the difference
+        self.s = SimpleSolver()
+        self.s.set("timeout", TIMEOUT_MS)
+        self.colored = [[Bool(f"B_{i},{j}") for j in range(n)] for i in range(n)]
+        for i in range(n):
+            for j in range(n):
+                if i+1 < n:
+                    self.s.add(Not(And(self.colored[i][j], self.colored[i+1][j])))
+                if j+1 < n:
+                    self.s.add(Not(And(self.colored[i][j], self.colored[i][j+1])))
+
+    def _statistics(self) -> dict:
+        st = self.s.statistics()
+        return {key: st.get_key_value(key) if key in st.keys() else 0 for key in ("conflicts", "decisions", "propagations")}
+
+    # Find the next connected model, adding connectivity cuts for disconnected ones
+    # Returns the bitboard of the colored cells, None if there is none and -1 on a timeout
+    def _next_model(self, cuts: list):
+        n = self.n
+        while True:
+            result = self.s.check()
+            if result == unsat:
+                return None
+            if result == unknown:
+                return -1
+            m = self.s.model()
+            colored = bitboard.from_matrix([[is_true(m.evaluate(self.colored[r][c])) for c in range(n)] for r in range(n)], n)
+            components = bitboard.components(bitboard.full_mask(n) & ~colored, n)
+            if len(components) <= 1:
+                return colored
+            # Color a cell in the component or make a boundary cell white
+            component = components[1]
+            boundary = bitboard.neighbours(component, n) & ~component
+            cut = Or([self.colored[i][j] for (i, j) in bitboard.cells(component, n)] + [Not(self.colored[i][j]) for (i, j) in bitboard.cells(boundary, n)])
+            cuts.append(cut)
+            self.s.add(cut)
+
+    def check(self, grid) -> tuple[bool, bool, dict]:
+        n = self.n
+        cuts = []
+        self.s.push()
+        for i in range(n):
+            for j in range(n):
+                for k in range(j+1, n):
+                    if grid[i][j] == grid[i][k]:
+                        self.s.add(Or(self.colored[i][j], self.colored[i][k]))
+                    if grid[j][i] == grid[k][i]:
+                        self.s.add(Or(self.colored[j][i], self.colored[k][i]))
+
+        before = self._statistics()
+        first = self._next_model(cuts)
+        unique = False
+        if first is not None and first != -1:
+            # Block the first solution, the puzzle is unique if no other connected model exists
+            self.s.add(Or([Not(self.colored[i][j]) if first & bitboard.bit(i, j, n) else self.colored[i][j] for i in range(n) for j in range(n)]))
+            unique = self._next_model(cuts) is None
+        # The effort covers both finding the solution and proving there is no other one
+        after = self._statistics()
+        effort = {key: after[key] - before[key] for key in after}
+        self.s.pop()
+
+        # Connectivity cuts hold for every puzzle of this size, so they are kept for the next candidates
+        for cut in cuts:
+            self.s.add(cut)
+        return first is not None and first != -1, unique, effort
+
+# Check if a grid has a unique solution and measure the effort of solving it on the reused solver for its size
+def check(grid) -> tuple[bool, bool, dict]:
+    n = len(grid)
+    if n not in _checkers:
+        _checkers[n] = _Checker(n)
+    return _checkers[n].check(grid)
+
+# Score the effort statistics using a single statistic or the weighted effort score
+def score(effort: dict, metric: str) -> float:
+    if metric == "effort":
+        return effort_score({"statistics": effort}, EFFORT_WEIGHTS)
+    return effort[metric]
@@ -4,67 +4,126 @@ import argparse
 import uuid
 import os
 import sys
-from collections import deque
-from asp import solve
+import time
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
-# Change if you need a puzzle of n>31
-# Might be dangerous
-sys.setrecursionlimit(9970)
+# Make the shared utilities of the repository available when running this script directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Make the other generator modules available when this module is imported from the repository root
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import utils.bitboard as bitboard
+from oracles import get_oracle, select_oracle, OracleTimeout
+import difficulty
 
 # Generates and saves the puzzle instance (relative to directory it is called from) if it passes basic validity checks
 # Returns true if saved, and false if not
-def generate(filename: str, n: int, seed: int = None, pcopyneighbour: int = -1, pcopyintersectionrowcolumn: int = -1, verbose: bool = False) -> bool:
-    seed = np.random.SeedSequence(seed)
+def generate(filename: str, n: int, seed: int = None, pcopyneighbour: int = -1, pcopyintersectionrowcolumn: int = -1, verbose: bool = False, oracle: str = None,
+             target: float = None, metric: str = "conflicts", steps: int = 200, batch: int = 5) -> bool:
+    # The seed is either an integer or a SeedSequence spawned by the corpus scheduler
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    grid = generate_grid(n, seed, pcopyneighbour, pcopyintersectionrowcolumn, verbose, oracle, target, metric, steps, batch)
+    if grid is None:
+        return False
+
+    if verbose:
+        print ("Generated grid passed validity checks, saving...")
+    save_puzzle(filename, n, grid, seed)
+    return True
+
+# Generates a puzzle instance that passes basic validity checks and has a unique solution
+# Returns the grid, or None if no puzzle was found
+# The uniqueness oracle is picked from the calibrated config for this size if none is given
+# If a target is given, unique puzzles are made harder by hill climbing and only returned once their effort exceeds the target
+def generate_grid(n: int, seed: np.random.SeedSequence, pcopyneighbour: int = -1, pcopyintersectionrowcolumn: int = -1, verbose: bool = False, oracle: str = None,
+                  target: float = None, metric: str = "conflicts", steps: int = 200, batch: int = 5) -> np.ndarray:
     seededRandomGenerator = np.random.default_rng(seed)
+    # The hill climber draws from its own child stream, so the candidates drawn from the main stream do not depend on how a climb went
+    climbRandomGenerator = np.random.default_rng(seed.spawn(1)[0]) if target is not None else None
+    solve = get_oracle(oracle or select_oracle(n))
 
     found_solution = False
+    # Number of candidates rejected by every check, printed when verbose
+    rejections = {"max numbers": 0, "max consecutive numbers": 0, "alternative solution": 0, "no solution": 0, "not unique": 0, "timeout": 0, "too easy": 0}
 
     for i in range(100):
         if found_solution:
             break
         solution = generateSolution(n, seededRandomGenerator)
-        for j in range(5): # try to fill 5 times since generating is slow
-            grid = create_puzzle_recursive(n, solution, seededRandomGenerator, pcopyneighbour, pcopyintersectionrowcolumn)
-            # Grid generator was unable to make a valid puzzle
-            if grid is None:
-                if verbose:
-                    print("Failed to generate valid puzzle")
-                break
-
-            # Basic validity checks
-            # No more then [n/2] of the equal numbers in a row / column
-            if not check_max_numbers(grid, n):
+        # Fill the pattern up to batch times at once, so the validity rules run on all fills together
+        grids = create_puzzle_batch(n, solution, seededRandomGenerator, batch, pcopyneighbour, pcopyintersectionrowcolumn)
+        # Grid generator was unable to make a valid puzzle
+        if len(grids) < batch and verbose:
+            print("Failed to generate valid puzzle")
+
+        # Basic validity checks
+        # No more then [n/2] of the equal numbers in a row / column
+        max_numbers = check_max_numbers_batch(grids, n)
+        # No more then 3 equal numbers following eachother
+        max_consecutive_numbers = check_max_consecutive_numbers_batch(grids, n)
+
+        for j, grid in enumerate(grids):
+            if not max_numbers[j]:
+                rejections["max numbers"] += 1
                 if verbose:
                     print("Grid failed the max numbers check")
                 continue
-            # No more then 3 equal numbers following eachother
-            if not check_max_consecutive_numbers(grid, n):
+            if not max_consecutive_numbers[j]:
+                rejections["max consecutive numbers"] += 1
                 if verbose:
                     print("Grid failed the max consecutive numbers check")
                 continue
+            # A small change to the black pattern gives another valid solution, so the oracle would reject it anyway
+            if has_alternative_solution(grid, solution, n):
+                rejections["alternative solution"] += 1
+                if verbose:
+                    print(f"Attempt #{i}:{j}: Alternative solution found by the pre-filter")
+                continue
 
-            # Run the solver for a solution and uniqueness check
-            sol, unique = solve(grid)
+            # Run the solver for a solution and uniqueness check, a candidate the oracle cannot decide in time is rejected
+            try:
+                sol, unique = solve(grid)
+            except OracleTimeout:
+                rejections["timeout"] += 1
+                if verbose:
+                    print(f"Attempt #{i}:{j}: Oracle timed out")
+                continue
 
             # Check solver output
             if not sol:
+                rejections["no solution"] += 1
                 if verbose:
                     print(f"Attempt #{i}:{j}: No valid solution found")
             elif not unique:
+                rejections["not unique"] += 1
                 if verbose:
                     print(f"Attempt #{i}:{j}: Not a unique solution")
+            elif target is not None:
+                grid, effort = hill_climb(grid, solution, n, climbRandomGenerator, target, metric, steps)
+                if effort <= target:
+                    rejections["too easy"] += 1
+                    if verbose:
+                        print(f"Attempt #{i}:{j}: Puzzle did not reach the target effort ({effort:.1f} <= {target})")
+                else:
+                    if verbose:
+                        print(f"Attempt #{i}:{j}: Correct puzzle found with effort {effort:.1f}!")
+                    found_solution = True
+                    break
             else:
                 if verbose:
                     print(f"Attempt #{i}:{j}: Correct puzzle found!")
                 found_solution = True
                 break
+
+    if verbose:
+        print("Rejected candidates: " + ", ".join(f"{reason}: {count}" for reason, count in rejections.items()))
      
     if not found_solution:
-        return False
+        return None
+    return grid
 
-    if verbose:
-        print ("Generated grid passed validity checks, saving...")
+# Saves a puzzle instance relative to the directory it is called from, returns the path of the file
+def save_puzzle(filename: str, n: int, grid: np.ndarray, seed: np.random.SeedSequence) -> str:
     # Make proper file structure for saving the puzzles
     folder = os.path.join("puzzles", f"{n}x{n}")
     os.makedirs(folder, exist_ok=True)
@@ -74,58 +133,141 @@ def generate(filename: str, n: int, seed: int = None, pcopyneighbour: int = -1,
         file.write(f"{n}\n\n")
         for row in grid:
             file.write(" ".join(map(str, row)) + "\n")
-        file.write(f"\n@{seed.entropy}")
+        file.write(f"\n@{format_seed(seed)}")
     
-    return True
+    return full_path
 
 # Take every column and row and verify it has no more then [n/2] of the same number
 def check_max_numbers(grid: np.ndarray, n: int) -> bool:
+    return bool(check_max_numbers_batch(grid[None], n)[0])
+
+def check_max_consecutive_numbers(grid: np.ndarray, n: int) -> bool:
+    return bool(check_max_consecutive_numbers_batch(grid[None], n)[0])
+
+# Batched version of check_max_numbers for a (B, n, n) array of grids, returns a Boolean per grid
+# The numbers of every row and column of every grid are counted in a single bincount by offsetting them per line
+def check_max_numbers_batch(grids: np.ndarray, n: int) -> np.ndarray:
     maxOccurences = math.ceil(n / 2)
     if maxOccurences < 2:
         maxOccurences = 2
 
-    # rows
-    for row in grid:
-        _, counts = np.unique(row, return_counts=True)
-        if (np.any(counts > maxOccurences)):
-            return False
-        
-    #columns
-    for col in grid.T:
-        _, counts = np.unique(col, return_counts=True)
-        if (np.any(counts > maxOccurences)):
-            return False
-        
-    return True
+    B = len(grids)
+    if B == 0:
+        return np.zeros(0, dtype=bool)
+    lines = np.concatenate((grids, grids.transpose(0, 2, 1)), axis=1).reshape(B * 2 * n, n)
+    offsets = np.arange(B * 2 * n)[:, None] * (n + 1)
+    counts = np.bincount((lines + offsets).ravel(), minlength=B * 2 * n * (n + 1)).reshape(B, 2 * n * (n + 1))
+    return ~np.any(counts > maxOccurences, axis=1)
+
+# Batched version of check_max_consecutive_numbers for a (B, n, n) array of grids, returns a Boolean per grid
+# Four equal numbers following eachother are three equal neighbouring pairs in a row
+def check_max_consecutive_numbers_batch(grids: np.ndarray, n: int) -> np.ndarray:
+    valid = np.ones(len(grids), dtype=bool)
+    for lines in (grids, grids.transpose(0, 2, 1)):
+        equal = lines[:, :, 1:] == lines[:, :, :-1]
+        runs = equal[:, :, :-2] & equal[:, :, 1:-1] & equal[:, :, 2:]
+        valid &= ~runs.any(axis=(1, 2))
+    return valid
+
+# Check if the black pattern the grid was filled for can be changed locally into another valid solution
+# Only the cells that change are checked against the white numbers, since the original pattern is a valid solution
+def has_alternative_solution(grid: np.ndarray, solution: np.ndarray, n: int) -> bool:
+    black = bitboard.from_matrix(solution, n)
+    white = bitboard.full_mask(n) & ~black
+    boards = bitboard.value_boards(grid, n, white)
+
+    def free(r, c, ignore):
+        # The number of this cell does not occur in the white cells of its row and column, besides the ignored cells
+        lines = bitboard.row_mask(r, n) | bitboard.col_mask(c, n)
+        return not boards.get(grid[r, c], 0) & lines & ~ignore
+
+    def connected(to_white, to_black):
+        new_white = (white & ~to_black) | to_white
+        return bitboard.flood_fill(new_white & -new_white, new_white, n, new_white) == new_white
+
+    for r, c in bitboard.cells(black, n):
+        pinned = boards.get(grid[r, c], 0) & (bitboard.row_mask(r, n) | bitboard.col_mask(c, n))
+        # A black cell whose number is not used by a white cell in its row or column could also be white
+        # All its neighbours are white, so the white cells stay connected
+        if not pinned:
+            return True
+        # A black cell pinned by a single white cell can swap colors with it if the white cell can be black
+        if pinned & (pinned-1) == 0:
+            to_white = bitboard.bit(r, c, n)
+            if not bitboard.neighbours(pinned, n) & black & ~to_white and connected(to_white, pinned):
+                return True
 
-def check_max_consecutive_numbers(grid: np.ndarray, n: int) -> bool:
-    #rows
-    for row in grid:
-        count = 1
-        for i in range(1, len(row)):
-            if (row[i] == row[i - 1]):
-                count += 1
-                if (count > 3):
-                    return False
-            else:
-                count = 1
-
-    #columns
-    for col in grid.T:
-        count = 1
-        for i in range(1, len(col)):
-            if (col[i] == col[i - 1]):
-                count += 1
-                if (count > 3):
-                    return False
-            else:
-                count = 1
-    
-    return True
+    # Two diagonal black cells in a 2x2 block can swap with the two white cells if none of their numbers are pinned
+    for r in range(n-1):
+        for c in range(n-1):
+            for (a, b), (x, y) in ((((r, c), (r+1, c+1)), ((r, c+1), (r+1, c))), (((r, c+1), (r+1, c)), ((r, c), (r+1, c+1)))):
+                to_white = bitboard.bit(*a, n) | bitboard.bit(*b, n)
+                to_black = bitboard.bit(*x, n) | bitboard.bit(*y, n)
+                if black & to_white != to_white:
+                    continue
+                if not free(*a, to_black) or not free(*b, to_black):
+                    continue
+                # The new black cells can not touch the black cells that stay
+                if bitboard.neighbours(to_black, n) & black & ~to_white:
+                    continue
+                if connected(to_white, to_black):
+                    return True
+    return False
+
+# Make a unique puzzle harder by changing the numbers of black cells to other numbers that are still used by a white cell in their row or column
+# A change is kept if the puzzle stays unique and the effort does not decrease, stopping as soon as the effort exceeds the target
+# Returns the hardest grid found and its effort
+def hill_climb(grid: np.ndarray, solution: np.ndarray, n: int, generator, target: float, metric: str, steps: int) -> tuple[np.ndarray, float]:
+    black = bitboard.from_matrix(solution, n)
+    boards = bitboard.value_boards(grid, n, bitboard.full_mask(n) & ~black)
+    black_cells = bitboard.cells(black, n)
+
+    has_solution, unique, effort = difficulty.check(grid)
+    if not has_solution or not unique:
+        return grid, 0
+    best = difficulty.score(effort, metric)
+
+    for _ in range(steps):
+        if best > target or not black_cells:
+            break
+        r, c = black_cells[generator.integers(len(black_cells))]
+        # The whites never change, so only numbers pinned by a white cell in the row or column keep the black cell necessary
+        lines = bitboard.row_mask(r, n) | bitboard.col_mask(c, n)
+        options = [number for number, board in boards.items() if board & lines and number != grid[r, c]]
+        if not options:
+            continue
+
+        candidate = grid.copy()
+        candidate[r, c] = generator.choice(options)
+        if not check_max_numbers(candidate, n) or not check_max_consecutive_numbers(candidate, n) or has_alternative_solution(candidate, solution, n):
+            continue
+        has_solution, unique, effort = difficulty.check(candidate)
+        if not has_solution or not unique:
+            continue
+        score = difficulty.score(effort, metric)
+        if score >= best:
+            grid, best = candidate, score
+    return grid, best
 
 # Create a grid of 'black' cells, where a black cell is denoted as a '1'
+# Black cells can only touch diagonally, so the white area is split exactly when a new black cell closes a loop
+# of diagonally touching black cells (where the border of the grid counts as one big black cell)
+# This is tracked with a union-find over the black cells and the border, so every placement is near-constant time
 def generateSolution(n, generator):
     pattern = np.zeros((n, n))  
+    # Bitboard of the black cells, kept in sync with the pattern
+    black = 0
+
+    # Union-find parents of the black cells, the last entry is the border
+    wall = n*n
+    parent = list(range(n*n + 1))
+
+    def find(x):
+        while parent[x] != x:
+            # Path halving
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
 
     # Create a randomly shuffled list of all cells
     cells = [(r, c) for r in range(n) for c in range(n)]
@@ -133,126 +275,118 @@ def generateSolution(n, generator):
 
     flipped = 0
     for r, c, in cells:
+        b = bitboard.bit(r, c, n)
 
         # Check surrounding squares
-        hasBlackNeighbour = any(0 <= rr < n and 0 <= cc < n and pattern[rr, cc] == 1
-                                 for rr, cc in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)))
-        if hasBlackNeighbour:
+        if bitboard.neighbours(b, n) & black:
             continue
 
-        pattern[r, c] = 1
-        
-        d_black_neighbours = 0
-        walls = 0
+        # Find the loops of black cells this cell touches, through its diagonal black neighbours and the border
+        touching = []
         for rr, cc in ((r-1, c-1), (r-1, c+1), (r+1, c-1), (r+1, c+1)):
-            if 0 <= rr < n and 0 <= cc < n:
-                if pattern[rr, cc] == 1:
-                    d_black_neighbours += 1
-            else:
-                # We dont care about inrementing walls, since we can only be next to 1 wall. 
-                # If we are next to 2 walls we are in a corner and the white area cannot be split here
-                walls = 1
-
-        # We cannot split the white area if there is only one or no diagonal connection with a black square    
-        if d_black_neighbours + walls < 2:
-            flipped += 1
-            continue 
-
-        neighbours = [(rr, cc) for rr, cc in ((r-1, c), (r+1, c), (r, c-1), (r, c+1))if 0 <= rr < n and 0 <= cc < n]
-        start = neighbours[0] 
-        goals = set(neighbours[1:])
-        # We check if we can reach each neighbour from each other
-        # (note that this property is transitive, so we can pick one and search from there)
-        # If this is the case, every white square is still connected
-        if bfs_white(start, goals, pattern, n):
-            flipped += 1
-        else:
-            pattern[r, c] = 0
-            
-    return pattern
-
-# Use breadth first search to attempt to visit all squares listed in 'to'
-def bfs_white(start, to, pattern, n) -> bool:
-    visited = set()
-    queue = deque()
-    queue.append(start)
-    visited.add(start)
-    while queue:
-        r, c = queue.popleft()
-        if (r, c) in to:
-            to.remove((r, c))
-            if len(to) == 0:
-                return True
+            if 0 <= rr < n and 0 <= cc < n and black & bitboard.bit(rr, cc, n):
+                touching.append(find(rr*n + cc))
+        if r == 0 or c == 0 or r == n-1 or c == n-1:
+            touching.append(find(wall))
 
-        for rr, cc in ((r-1, c), (r+1, c), (r, c-1), (r, c+1)):
-            if 0 <= rr < n and 0 <= cc < n and pattern[rr, cc] == 0 and (not (rr, cc) in visited):
-                queue.append((rr, cc))
-                visited.add((rr,cc))
+        # Touching the same group twice would close a loop around part of the white area
+        if len(set(touching)) < len(touching):
+            continue
 
-    return False
+        pattern[r, c] = 1
+        black |= b
+        for root in touching:
+            parent[root] = r*n + c
+        flipped += 1
+            
+    return pattern
 
-# Generate a puzzle using recursive backtracking
+# Generate a puzzle using iterative backtracking with an explicit stack
+# Numbers used in every row and column are kept as bitmasks, where bit i is set if number i is used
 def create_puzzle_recursive(n, solution, generator, pcopyneighbour, pcopyintersectionrowcolumn):
     grid = np.zeros((n, n), dtype=int)
 
     white_cells = [(r, c) for r in range(n) for c in range(n) if solution[r, c] == 0]
     black_cells = [(r, c) for r in range(n) for c in range(n) if solution[r, c] == 1]
 
-    used_in_row = [set() for _ in range(n)]
-    used_in_col = [set() for _ in range(n)]
+    all_numbers = ((1 << n) - 1) << 1
+    used_in_row = [0] * n
+    used_in_col = [0] * n
+
+    # Every entry holds the shuffled candidates of a white cell and the index of the next candidate to try
+    stack = []
+    # Number of steps that still need to be backtracked, 0 if we are moving forward
+    num_backtracks = 0
+    id = 0
+    while True:
+        if num_backtracks == 0:
+            if id == len(white_cells):
+                break
 
-    # Returns True if a solution is found
-    # false if not. Number specifies amount of steps to backtrack
-    def backtracking(id):
-        if id == len(white_cells):
-            return (True, None)
-        
-        r, c = white_cells[id]
+            r, c = white_cells[id]
+
+            # Find all possible values for this cell
+            available = all_numbers & ~(used_in_row[r] | used_in_col[c])
+            if not available:
+                # conflict has arised
+                # this must be because all numbers are already used up in row and column
+                # we backtrack till we find the first number in the row that doesn't appear in that column
+                # we undo that assignment and then try again
+                # let's analyze where the conflict happens
+                num_backtracks = 1
+                while True:
+                    c2 = c - num_backtracks
+                    if c2 < 0:
+                        print("A conflict arised but conflict analysis failed (which shouldn't happen?). Aborting generation")
+                        exit(1)
+
+                    if not used_in_col[c] >> int(grid[r, c2]) & 1:
+                        # conflict cause found
+                        break
+
+                    num_backtracks += 1
+                id -= 1
+                if id < 0:
+                    return None
+                continue
 
-        # Find all possible values for this cell
-        forbidden = used_in_row[r] | used_in_col[c]
-        candidates = [i for i in range(1, n+1) if i not in forbidden]
-        if not candidates:
-            # conflict has arised
-            # this must be because all numbers are already used up in row and column
-            # we backtrack till we find the first number in the row that doesn't appear in that column
-            # we undo that assignment and then try again
-            # let's analyze where the conflict happens
-            num_backtracks = 1
-            while True:
-                c2 = c - num_backtracks
-                if c2 < 0:
-                    print("A conflict arised but conflict analysis failed (which shouldn't happen?). Aborting generation")
-                    exit(1)
-
-                if not grid[r, c2] in used_in_col[c]:
-                    # conflict cause found
-                    return (False, num_backtracks)
-
-                num_backtracks += 1
-        
-        # Shuffle candidates and attempt to assign
-        generator.shuffle(candidates)
-
-        for i in candidates:
-            grid[r, c] = i
-            used_in_row[r].add(i)
-            used_in_col[c].add(i)
-            (success, num_backtracks) = backtracking(id+1)
-            if success:
-                return (True, None)
-            used_in_row[r].remove(i)
-            used_in_col[c].remove(i)
+            # Shuffle candidates and attempt to assign
+            candidates = _numbers(available)
+            generator.shuffle(candidates)
+            stack.append([candidates, 0])
+        else:
+            # Undo the assignment of this cell after its successor failed
+            r, c = white_cells[id]
+            candidates, index = stack[-1]
+            i = candidates[index - 1]
+            used_in_row[r] &= ~(1 << i)
+            used_in_col[c] &= ~(1 << i)
             grid[r, c] = 0
-            num_backtracks = num_backtracks - 1
+            num_backtracks -= 1
             if num_backtracks > 0:
-                return (False, num_backtracks)
-        return (False, 1)
-    
-    # Start filling algorithm with backtracking
-    # if False, it could not generate a valid solution
-    if not backtracking(0)[0]:
-        return None
+                stack.pop()
+                id -= 1
+                if id < 0:
+                    return None
+                continue
+
+        # Attempt to assign the next candidate
+        candidates, index = stack[-1]
+        if index == len(candidates):
+            stack.pop()
+            num_backtracks = 1
+            id -= 1
+            if id < 0:
+                return None
+            continue
+
+        r, c = white_cells[id]
+        i = candidates[index]
+        stack[-1][1] = index + 1
+        grid[r, c] = i
+        used_in_row[r] |= 1 << i
+        used_in_col[c] |= 1 << i
+        id += 1
     
     # Generate numbers for black squares
     for r, c in black_cells:
@@ -268,7 +402,7 @@ def create_puzzle_recursive(n, solution, generator, pcopyneighbour, pcopyinterse
 
                 continue
             elif p - max(0, pcopyneighbour) < pcopyintersectionrowcolumn:
-                used = list(used_in_row[r].union(used_in_col[c]))
+                used = _numbers(used_in_row[r] | used_in_col[c])
                 if len(used) > 0:
                     grid[r, c] = generator.choice(used)
                     continue
@@ -277,20 +411,105 @@ def create_puzzle_recursive(n, solution, generator, pcopyneighbour, pcopyinterse
         # Only choose numbers that occur in row and/or column
         # since otherwise the black cell could also be white
         # which means there are multiple solutions
-        used = list(used_in_row[r].union(used_in_col[c]))
+        used = _numbers(used_in_row[r] | used_in_col[c])
         grid[r, c] = generator.choice(used) 
     return grid
 
-# Helper function for parallelization
-def _generate_one(filename, n, seed, pcopyneighbour, pcopyintersectionrowcolumn):
-    success = False
-    while not success:
-        success = generate(filename, n, seed, pcopyneighbour, pcopyintersectionrowcolumn)
-    return filename
+# Fill the same solution pattern up to count times, stopping at the first failed fill
+# Returns the fills as a (B, n, n) array
+def create_puzzle_batch(n, solution, generator, count, pcopyneighbour, pcopyintersectionrowcolumn):
+    grids = []
+    for _ in range(count):
+        grid = create_puzzle_recursive(n, solution, generator, pcopyneighbour, pcopyintersectionrowcolumn)
+        if grid is None:
+            break
+        grids.append(grid)
+    return np.array(grids, dtype=int).reshape(len(grids), n, n)
+
+# List the numbers set in a bitmask in increasing order
+def _numbers(mask):
+    numbers = []
+    while mask:
+        lowest = mask & -mask
+        numbers.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return numbers
+
+# Write a seed as its entropy, followed by the spawn key if it was spawned, e.g. 1234:0.5
+def format_seed(seed: np.random.SeedSequence) -> str:
+    if not seed.spawn_key:
+        return str(seed.entropy)
+    return f"{seed.entropy}:" + ".".join(map(str, seed.spawn_key))
+
+# Recreate the SeedSequence of a puzzle from the seed written in its file, so the puzzle can be generated again
+def parse_seed(text: str) -> np.random.SeedSequence:
+    entropy, _, key = text.partition(":")
+    return np.random.SeedSequence(int(entropy), spawn_key=tuple(int(k) for k in key.split(".")) if key else ())
+
+# Parse a size:count pair of a manifest, raises a ValueError if it is not valid
+def parse_manifest_entry(text: str) -> tuple[int, int]:
+    size, count = text.split(":")
+    return int(size), int(count)
+
+# Spawn a stream per size from the root seed, and a stream per puzzle from that of its size
+# Returns a list of (size, seeds) pairs in the order of the manifest
+def spawn_seeds(manifest, seed=None):
+    root = np.random.SeedSequence(seed)
+    return [(n, size_seed.spawn(count)) for (n, count), size_seed in zip(manifest, root.spawn(len(manifest)))]
+
+# Generate and save a single puzzle
+# A seed that fails is retried with a new stream spawned from it, so retries stay reproducible
+# Returns the path, grid and seed of the puzzle
+def generate_puzzle(prefix, n, seed, options):
+    while True:
+        # Name the file after its seed, so a corpus generated from the same root seed gets the same names
+        filename = f"{prefix or ''}{uuid.UUID(int=int.from_bytes(seed.generate_state(4).tobytes(), 'little'))}.singles"
+        grid = generate_grid(n, seed, **options)
+        if grid is not None:
+            return save_puzzle(filename, n, grid, seed), grid, seed
+        seed = seed.spawn(1)[0]
+
+# Helper function for parallelization, generates a chunk of puzzles of one size
+# Returns the size, the generated filenames and the time spent
+def _generate_chunk(prefix, n, seeds, options):
+    start = time.perf_counter()
+    filenames = [os.path.basename(generate_puzzle(prefix, n, seed, options)[0]) for seed in seeds]
+    return n, filenames, time.perf_counter() - start
+
+# Generate a corpus for a manifest of (size, count) pairs
+# The puzzles are split into chunks that idle workers pick up from the shared queue of the pool
+def generate_corpus(manifest, seed=None, prefix=None, chunk=4, max_workers=None, options=None):
+    options = options or {}
+
+    futures = []
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+        start = time.perf_counter()
+        for n, seeds in spawn_seeds(manifest, seed):
+            for i in range(0, len(seeds), chunk):
+                futures.append(executor.submit(_generate_chunk, prefix, n, seeds[i:i + chunk], options))
+
+        id = 0
+        busy = {}
+        generated = {}
+        for future in as_completed(futures):
+            n, filenames, elapsed = future.result()
+            busy[n] = busy.get(n, 0) + elapsed
+            generated[n] = generated.get(n, 0) + len(filenames)
+            for filename in filenames:
+                id += 1
+                print(f"Generated puzzle {id}: {filename}")
+        wall = time.perf_counter() - start
+
+    print(f"Generated {id} puzzles in {wall:.1f}s")
+    for n in sorted(generated):
+        print(f"{n}x{n}: {generated[n]} puzzles, {busy[n]:.1f} worker seconds, {generated[n] / busy[n]:.2f} puzzles per worker second")
+    return generated
 
 # Run the generator from command line, using the arguments if needed
 # Example: generate 3 4x4 puzzle instances, and save to the folder 'newGenerations' (Make sure the folder exists)
 # python generator.py -c 3 -n 4 -f newGenerations/
+# Example: reproducibly generate 100 5x5 and 50 10x10 puzzle instances
+# python generator.py -M 5:100 10:50 -s 42
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate n x n singles puzzle(s)")
 
@@ -310,22 +529,44 @@ if __name__ == "__main__":
         help="Number of puzzles to generate"
     )
 
-    # Optional seed (will generate equal puzzles if count > 1)
+    # Optional root seed, every puzzle gets its own stream spawned from it
     parser.add_argument(
         "-s", "--seed",
         type=int,
         default=None,
-        help="Seed for number generation (will create all equal puzzles if count > 1)"
+        help="Root seed for number generation, every puzzle uses a stream spawned from it"
     )
 
-    # Required n x n size
+    # n x n size, required unless a manifest is given
     parser.add_argument(
         "-n", '--size',
         type=int,
-        required=True,
+        default=None,
         help="Size of the puzzle (n x n)"
     )
 
+    parser.add_argument(
+        "-M", "--manifest",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Sizes and counts to generate as size:count pairs, e.g. 5:100 10:50 (replaces --size and --count)"
+    )
+
+    parser.add_argument(
+        "-ch", "--chunk",
+        type=int,
+        default=4,
+        help="Number of puzzles handed to a worker at once"
+    )
+
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (defaults to the number of cores)"
+    )
+
     parser.add_argument(
         "-pn", "--pcopyneighbour",
         type=float,
@@ -340,31 +581,69 @@ if __name__ == "__main__":
         help="Chance the number of a black square is that of intersection of row and column instead of random"
     )
 
+    parser.add_argument(
+        "-o", "--oracle",
+        type=str,
+        default=None,
+        help="Uniqueness oracle: asp, z3 or smt:<solver specification> (defaults to the calibrated oracle for this size)"
+    )
+
+    parser.add_argument(
+        "-t", "--target",
+        type=float,
+        default=None,
+        help="Only save puzzles whose effort exceeds this target, reached by hill climbing over the numbers of black cells"
+    )
+
+    parser.add_argument(
+        "-m", "--metric",
+        type=str,
+        choices=difficulty.METRICS,
+        default="conflicts",
+        help="Effort metric used for the target: solver conflicts, decisions or the weighted effort score of rq3"
+    )
+
+    parser.add_argument(
+        "-st", "--steps",
+        type=int,
+        default=200,
+        help="Maximum number of hill climbing steps per puzzle"
+    )
+
+    parser.add_argument(
+        "-b", "--batch",
+        type=int,
+        default=5,
+        help="Number of fills per solution pattern that are validated together"
+    )
+
     args = parser.parse_args()
-    
-    # Prepare list of filenames
-    filenames = []
-    for i in range(args.count):
-        uid = uuid.uuid4()
-        if args.filename:
-            filename = f"{args.filename}{uid}.singles"
-        else:
-            filename = f"{uid}.singles"
-        filenames.append(filename)
-
-    max_workers = os.cpu_count() or 1
-
-    # Setup worker pool
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        futures = [
-            executor.submit(_generate_one, filename, args.size, args.seed, args.pcopyneighbour, args.pcopyintersectionrowcolumn) 
-            for filename in filenames
-        ]
-        
-        id = 0
-        for future in as_completed(futures):
-            id += 1
-            generated_file = future.result()
-            print(f"Generated puzzle {id}: {generated_file}")
 
-        executor.shutdown()
+    if args.oracle is not None:
+        try:
+            get_oracle(args.oracle)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+    
+    if args.manifest is not None:
+        manifest = []
+        for pair in args.manifest:
+            try:
+                manifest.append(parse_manifest_entry(pair))
+            except ValueError:
+                sys.exit(f"Error: Manifest entries must be size:count pairs, got {pair}")
+    elif args.size is not None:
+        manifest = [(args.size, args.count)]
+    else:
+        sys.exit("Error: Either --size or --manifest is required")
+
+    options = {
+        "pcopyneighbour": args.pcopyneighbour,
+        "pcopyintersectionrowcolumn": args.pcopyintersectionrowcolumn,
+        "oracle": args.oracle,
+        "target": args.target,
+        "metric": args.metric,
+        "steps": args.steps,
+        "batch": args.batch
+    }
+    generate_corpus(manifest, args.seed, args.filename, args.chunk, args.workers, options)
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+# Make the solvers of the repository available when running this script directly
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Make the other generator modules available when this module is imported from the repository root
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import asp
+import z3solver
+import solver.z3solver as smt
+from solver.specs import parse_spec
+
+'''
+Uniqueness oracles for the generator. Every oracle takes a candidate grid and returns (has_solution, unique),
+oracles that can time out without an answer raise an OracleTimeout instead.
+Which oracle is fastest depends on the size of the puzzle, so the fastest oracle per size can be calibrated
+and is stored in oracles.json, which the generator uses when no oracle is given.
+'''
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "oracles.json")
+# Oracle used for sizes when nothing has been calibrated
+DEFAULT_ORACLE = "asp"
+# Prefix for oracles using a solver specification of the main solver, e.g. smt:lazy+pi
+SMT_PREFIX = "smt:"
+
+class OracleTimeout(Exception):
+    pass
+
+def _z3(grid) -> tuple[bool, bool]:
+    sol, unique = z3solver.solve(grid)
+    return sol is not None, unique
+
+ORACLES = {
+    "asp": asp.solve,
+    "z3": _z3
+}
+
+# Check uniqueness with a solver specification of the main solver, raises an OracleTimeout if the solver timed out
+def _smt(spec: dict, grid) -> tuple[bool, bool]:
+    has_solution, unique, timed_out = smt.check_unique(spec["base"], spec["constraints"], grid.tolist(), simple_solver=spec["simple_solver"])
+    if timed_out:
+        raise OracleTimeout(f"Timed out after {smt.TIMEOUT} ms")
+    return has_solution, unique
+
+# Returns the oracle function for a name, raises a ValueError for unknown oracles
+def get_oracle(name: str):
+    if name in ORACLES:
+        return ORACLES[name]
+    if name.startswith(SMT_PREFIX):
+        spec = parse_spec(name[len(SMT_PREFIX):])
+        if spec["warm_start"]:
+            raise ValueError(f"Warm start is not supported by uniqueness oracles: {name}")
+        return lambda grid: _smt(spec, grid)
+    raise ValueError(f"Unknown oracle: {name}")
+
+def load_config(path: str = CONFIG_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return {int(n): oracle for n, oracle in json.load(file).items()}
+
+# Pick the calibrated oracle for this size, or that of the nearest calibrated size
+def select_oracle(n: int, config: dict = None) -> str:
+    if config is None:
+        config = load_config()
+    if not config:
+        return DEFAULT_ORACLE
+    if n in config:
+        return config[n]
+    nearest = min(config, key=lambda size: (abs(size - n), size))
+    return config[nearest]
+
+# Sample candidates the same way generate does, up to the point where the oracle would be called
+def sample_candidates(n: int, count: int, generator) -> list:
+    # The generator module is generator/generator.py when imported from the repository root, and generator.py when run as a script
+    try:
+        from generator.generator import generateSolution, create_puzzle_recursive, check_max_numbers, check_max_consecutive_numbers
+    except ImportError:
+        from generator import generateSolution, create_puzzle_recursive, check_max_numbers, check_max_consecutive_numbers
+
+    candidates = []
+    while len(candidates) < count:
+        solution = generateSolution(n, generator)
+        grid = create_puzzle_recursive(n, solution, generator, -1, -1)
+        if grid is None or not check_max_numbers(grid, n) or not check_max_consecutive_numbers(grid, n):
+            continue
+        candidates.append(grid)
+    return candidates
+
+# Call an oracle for calibration, a timeout still counts with the time it took
+def _timed_call(oracle, grid) -> None:
+    try:
+        oracle(grid)
+    except OracleTimeout:
+        pass
+
+# Time every oracle on the same candidates per size and store the fastest one in the config
+def calibrate(sizes: list, oracles: list, samples: int = 10, seed: int = None, path: str = CONFIG_PATH, verbose: bool = False) -> dict:
+    generator = np.random.default_rng(seed)
+    functions = {name: get_oracle(name) for name in oracles}
+    config = load_config(path)
+
+    for n in sizes:
+        candidates = sample_candidates(n, samples, generator)
+        timings = {}
+        for name, oracle in functions.items():
+            # Warm up once, the persistent ASP session only grounds once per size in a worker
+            _timed_call(oracle, candidates[0])
+            start = time.perf_counter()
+            for grid in candidates:
+                _timed_call(oracle, grid)
+            timings[name] = time.perf_counter() - start
+        config[n] = min(timings, key=timings.get)
+        if verbose:
+            print(f"{n}x{n}: " + ", ".join(f"{name} {timings[name]:.3f}s" for name in oracles) + f" -> {config[n]}")
+
+    with open(path, "w") as file:
+        json.dump({str(n): config[n] for n in sorted(config)}, file, indent=4)
+    return config
+
+# Calibrate the oracles from command line
+# Example: time the ASP and z3 oracles and the lazy main solver on 10 candidates of size 5, 10 and 15
+# python oracles.py -n 5 10 15 -o asp z3 smt:lazy -c 10
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate the uniqueness oracle used per puzzle size")
+
+    parser.add_argument(
+        "-n", "--sizes",
+        type=int,
+        nargs="+",
+        required=True,
+        help="Sizes of the puzzles (n x n) to calibrate"
+    )
+
+    parser.add_argument(
+        "-o", "--oracles",
+        type=str,
+        nargs="+",
+        default=["asp", "z3", "smt:lazy"],
+        help="Oracles to compare: asp, z3 or smt:<solver specification>"
+    )
+
+    parser.add_argument(
+        "-c", "--count",
+        type=int,
+        default=10,
+        help="Number of candidates to time per size"
+    )
+
+    parser.add_argument(
+        "-s", "--seed",
+        type=int,
+        default=None,
+        help="Seed for candidate generation"
+    )
+
+    args = parser.parse_args()
+
+    for name in args.oracles:
+        try:
+            get_oracle(name)
+        except ValueError as e:
+            sys.exit(f"Error: {e}")
+
+    calibrate(args.sizes, args.oracles, args.count, args.seed, verbose=True)
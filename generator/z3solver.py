@@ -69,7 +69,8 @@ def add_constraint_connectedwhite(s: Solver, colored: list, n: int) -> None:
 def solve(puzzle: list, solve_timeout_ms: int = None, check_timeout_ms: int = None) -> None:
     n = len(puzzle)
 
-    if solve_timeout_ms is None:
+    timeout_ms = solve_timeout_ms
+    if timeout_ms is None:
         timeout_ms = int(245*1.17**n)
 
     s = Solver()
@@ -1,18 +1,26 @@
 import argparse
 import time
 import os
+import sys
 import solver.z3solver as z3solver
 import hashlib
-import solver.z3solver_locals as z3solver_locals
-import solver.z3solver_globals as z3solver_globals
+import json
+import numpy as np
+import pandas as pd
+import generator.generator as generator
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 import experiments.rq1 as rq1
 import experiments.rq2 as rq2
 import experiments.rq3 as rq3
 import utils.plots as plots
 from datetime import datetime
-from utils.file_utils import read_puzzle, read_puzzle_dir, read_solution, read_solution_dir, write_file, append_comment, write_csv,read_csv, read_csv_folder
-from utils.utils import format_elapsed
-from solution_checker.checker import check_puzzle
+from utils.file_utils import read_puzzle, read_puzzle_dir, iter_puzzle_dir, count_puzzles, read_solution, iter_solution_dir, write_file, append_comment, write_csv,read_csv, read_csv_folder, append_csv, list_files, read_pack, write_pack, PACK_EXTENSIONS
+from utils.utils import format_elapsed, median_confidence_interval, median_confidence_min_runs
+from solution_checker.checker import check_puzzles, solutions_to_arrays
+from solver.specs import SOLVERS, parse_spec
+from utils.frames import read_csv_frame, read_csv_folder_frame, rescore_csv
+from utils.results_db import RESULTS_DB, connect, insert_results, read_results, read_grouped_results, import_csv, export_csv
 
 # Default path to the puzzle folder
 PUZZLES_FOLDER = os.path.abspath("puzzles")
@@ -20,47 +28,23 @@ PUZZLES_FOLDER = os.path.abspath("puzzles")
 SOLUTIONS_FOLDER = os.path.abspath("solutions")
 # Default path to the csv folder
 CSV_FOLDER = os.path.abspath("csvs")
+# Default path to the folder of rescored csv files
+RESCORED_FOLDER = os.path.abspath("csvs_rescored")
 # Options for the analysis command
-ANALYSIS_OPTIONS = ["write_csv", "rq1", "rq2", "rq3", "qq"]
+ANALYSIS_OPTIONS = ["write_csv", "write_db", "rq1", "rq2", "rq3", "qq"]
+# Analyses that only use the median of the runs of every puzzle, so the runs can be grouped by the results database
+GROUPED_ANALYSES = ["rq1", "rq2", "rq3"]
+# Analyses that read csv results directly into a typed frame
+FRAME_ANALYSES = ["rq1", "rq2"]
 # Multiplier for solver that triggered a timeout
 PAR_MULTIPLIER = 2
+# Maximum number of solutions the check command keeps in memory, they are checked in one batch per size once it is reached
+CHECK_BATCH = 256
+# Default path to the cache of audit verdicts, keyed by the oracle and the hash of the puzzle file contents
+AUDIT_CACHE = os.path.abspath(".audit_cache.json")
 
-# Available base solvers that can be called using the CLI
-SOLVERS = {
-    "qf_ia": z3solver.qf_ia,
-    "qf_ia_alt_u": z3solver.qf_ia_alt_u,
-    "qf_ia_alt_c": z3solver.qf_ia_alt_c,
-    "qf_ia_tree_c": z3solver.qf_ia_tree_c,
-    "qf_bv": z3solver.qf_bv,
-    "qf_bool": z3solver.boolean,
-    "qf_ia-c": z3solver.lazy,
-    "lazy": z3solver.lazy,
-    "qf_ia_external": z3solver.lazy
-}
-
-# Available constraints that can be added using the CLI
-CONSTRAINTS = {
-    "wn": z3solver_locals.white_neighbours,
-    "cc": z3solver_locals.corner_close,
-    "st": z3solver_locals.sandwich_triple,
-    "sp": z3solver_locals.sandwich_pair,
-    "tc": z3solver_locals.triple_corner,
-    "qc": z3solver_locals.quad_corner,
-    "tep": z3solver_locals.triple_edge_pair,
-    "dep": z3solver_locals.double_edge_pair,
-    "ce": z3solver_locals.close_edge,
-    "fde": z3solver_locals.force_double_edge,
-    "bc": z3solver_locals.border_close,
-    "lw": z3solver_globals.least_whites,
-    "mb": z3solver_globals.most_blacks,
-    "pi": z3solver_globals.pair_isolation,
-    "ci": z3solver_globals.close_isolation,
-    "wb": z3solver_globals.white_bridges
-}
-
-
-def _read_files(file: str|list, folder: str|list, recursive: bool, strict: bool, read_puzzles: bool) -> list:
-    """ Read file(s) or folder(s) for puzzle(s) or solution(s)
+def _iter_files(file: str|list, folder: str|list, recursive: bool, strict: bool, read_puzzles: bool):
+    """ Iterate over file(s) or folder(s) for puzzle(s) or solution(s), reading every file only when it is reached
 
     Args:
         file (str | list): A path or list of paths to the file(s) containing the puzzle(s) or solution(s)
@@ -69,27 +53,46 @@ def _read_files(file: str|list, folder: str|list, recursive: bool, strict: bool,
         strict (bool): A flag to enable strict file checking which throws an error on wrong files
         read_puzzles (bool): A flag to indicate looking for puzzles of solutions
 
-    Returns:
-        list: A list of puzzles of solutions found in the file(s) or folder(s)
+    Yields:
+        tuple: The path, grid and seed of every puzzle or solution found in the file(s) or folder(s)
     """
-    results = []
     if file:
         # file can be either a String of list based on the amount of arguments given
         args_file = file if isinstance(file, list) else [file]   
         for file in args_file:
-            if read_puzzles:
-                results.append(read_puzzle(file, strict))
+            if read_puzzles and os.path.splitext(file)[1].lower() in PACK_EXTENSIONS:
+                yield from read_pack(file)
+            elif read_puzzles:
+                yield read_puzzle(file, strict)
             else:
-                results.append(read_solution(file, strict))
+                yield read_solution(file, strict)
     if folder:
         # folder can be either a String of list based on the amount of arguments given
         args_folder = folder if isinstance(folder, list) else [folder]
         for folder in args_folder:
             if read_puzzles:
-                results.extend(read_puzzle_dir(folder, recursive, strict))
+                yield from iter_puzzle_dir(folder, recursive, strict)
             else:
-                results.extend(read_solution_dir(folder, recursive, strict))
-    return results
+                yield from iter_solution_dir(folder, recursive, strict)
+
+
+def _count_puzzles(file: str|list, folder: str|list, recursive: bool) -> int:
+    """ Count the puzzles in file(s) or folder(s) without parsing them
+
+    Args:
+        file (str | list): A path or list of paths to the file(s) containing the puzzle(s)
+        folder (str | list): A path or list of paths to the folder(s) containing the puzzle(s)
+        recursive (bool): A flag to enable looking in subfolders for additional files
+
+    Returns:
+        int: Number of puzzles
+    """
+    count = 0
+    for file in (file if isinstance(file, list) else [file]) if file else []:
+        count += count_puzzles(file, recursive) if os.path.splitext(file)[1].lower() in PACK_EXTENSIONS else 1
+    for folder in (folder if isinstance(folder, list) else [folder]) if folder else []:
+        count += count_puzzles(folder, recursive)
+    return count
 
 
 def _run_solver(solver: dict, puzzle: list, seed: int|None = None) -> tuple[list|None, dict, dict|None]:
@@ -105,35 +108,59 @@ def _run_solver(solver: dict, puzzle: list, seed: int|None = None) -> tuple[list
             the statistics from the solver, the puzzle statistics and the runtime
     """
     start = time.perf_counter()
-    timed_out, solution, solver_statistics, puzzle_statistics = z3solver.solve(solver["base"], solver["constraints"], puzzle, seed)
-    end = time.perf_counter()
-
+    cpu_start = time.process_time()
+    timed_out, solution, solver_statistics, puzzle_statistics = z3solver.solve(solver["base"], solver["constraints"], puzzle, seed, solver["warm_start"], solver["fallback"], solver["simple_solver"])
+    wall_time = time.perf_counter()-start
+    cpu_time = time.process_time()-cpu_start
+    budget = z3solver.TIMEOUT/1000
+
+    # Keep the raw times, the timeout flag and the budget, so the penalty can be changed afterwards with the rescore command
+    solver_statistics["wall_time"] = wall_time
+    solver_statistics["cpu_time"] = cpu_time
+    solver_statistics["timed_out"] = int(timed_out)
+    solver_statistics["budget"] = budget
     if timed_out:
         # Add a penalty to the runtime if the solver timed out
-        elapsed = (z3solver.TIMEOUT/1000)*PAR_MULTIPLIER
+        solver_statistics["runtime"] = budget*PAR_MULTIPLIER
     else:
-        elapsed = end-start
-    solver_statistics["runtime"] = elapsed
+        solver_statistics["runtime"] = wall_time
     return solution, solver_statistics, puzzle_statistics
 
 
-def _check_command(args: dict) -> None:
-    """ Command for checking the validity of solution files. Invoked through the CLI
+def _set_fallback(args: dict) -> None:
+    """ Set the base solver to fall back on when the native solver exceeds its node budget
 
     Args:
         args (dict): CLI arguments given for this command
     """
-    if ["file"] not in args:
-        return
-    solutions = _read_files(args.file, args.folder, args.recursive, args.strict, False)
+    for solver in args.solvers:
+        solver["fallback"] = SOLVERS[args.native_fallback]
+
+
+def _check_batch(solutions: list, write: bool) -> None:
+    """ Check a batch of solutions with one vectorised check per size, reporting them in the order they were read
 
-    for path, solution, _ in solutions:
+    Args:
+        solutions (list): Solutions read from solution files
+        write (bool): Flag to append the verdict to the solution files
+    """
+    by_size = {}
+    for index, (_, solution, _) in enumerate(solutions):
+        by_size.setdefault(len(solution), []).append(index)
+    reasons = [None]*len(solutions)
+    for indices in by_size.values():
+        values, colored = solutions_to_arrays([solutions[i][1] for i in indices])
+        _, batch_reasons = check_puzzles(values, colored)
+        for i, reason in zip(indices, batch_reasons):
+            reasons[i] = reason
+
+    for (path, _, _), reason in zip(solutions, reasons):
         fname = os.path.splitext(os.path.basename(path))[0]
     
-        correct = check_puzzle(solution)
-        print(f"Solution {fname} is {'correct' if correct else 'wrong'}")
+        correct = reason is None
+        print(f"Solution {fname} is {'correct' if correct else f'wrong ({reason})'}")
         
-        if args.write:
+        if write:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             if correct:
                 append_comment(path, f"Solution checked to be CORRECT on {timestamp}")
@@ -141,13 +168,35 @@ def _check_command(args: dict) -> None:
                 append_comment(path, f"Solution checked to be INCORRECT on {timestamp}")
 
 
+def _check_command(args: dict) -> None:
+    """ Command for checking the validity of solution files. Invoked through the CLI
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    if not args.file and not args.folder:
+        return
+
+    # Solutions are streamed, so checking starts on the first batch while the rest is still unread
+    batch = []
+    for solution in _iter_files(args.file, args.folder, args.recursive, args.strict, False):
+        batch.append(solution)
+        if len(batch) >= CHECK_BATCH:
+            _check_batch(batch, args.write)
+            batch = []
+    if batch:
+        _check_batch(batch, args.write)
+
+
 def _solve_command(args: dict) -> None:
     """ Command for solving puzzles. Invoked through the CLI
 
     Args:
         args (dict): CLI arguments given for this command
     """
-    puzzles = _read_files(args.file, args.folder, args.recursive, args.strict, True)
+    # Puzzles are read while solving, so the first puzzle is solved before the rest is parsed
+    puzzles = _iter_files(args.file, args.folder, args.recursive, args.strict, True)
+    _set_fallback(args)
 
     results = []
     for path, puzzle, seed in puzzles:
@@ -162,7 +211,7 @@ def _solve_command(args: dict) -> None:
         for solver in args.solvers:
             solution, solver_statistics, puzzle_statistics = _run_solver(solver, puzzle)
             elapsed = solver_statistics["runtime"]
-            print(f"{'Solved' if elapsed < z3solver.TIMEOUT*PAR_MULTIPLIER else 'Timed out'} {fname} ({n}x{n}): time= {format_elapsed(elapsed)}")
+            print(f"{'Timed out' if solver_statistics["timed_out"] else 'Solved'} {fname} ({n}x{n}): time= {format_elapsed(elapsed)}")
             results.append({
                 "puzzle": fname,
                 "size": n,
@@ -171,7 +220,7 @@ def _solve_command(args: dict) -> None:
                 "puzzle_statistics": puzzle_statistics
             })
 
-            if not elapsed >= z3solver.TIMEOUT*PAR_MULTIPLIER and best_elapsed is None or elapsed < best_elapsed:
+            if not solver_statistics["timed_out"] and (best_elapsed is None or elapsed < best_elapsed):
                 best_elapsed = elapsed
                 best_solution = solution
                 best_statistics = solver_statistics
@@ -229,7 +278,7 @@ def _gather_satistics(run: int, path: str, puzzle: list, seed: int, solver: dict
     n = len(puzzle)
 
     _, solver_statistics, puzzle_statistics = _run_solver(solver, puzzle, seed)
-    print(f"[Run: {run+1}] {'Solved' if solver_statistics["runtime"] < z3solver.TIMEOUT*PAR_MULTIPLIER else 'Timed out'} {fname} ({n}x{n}): " \
+    print(f"[Run: {run+1}] {'Timed out' if solver_statistics["timed_out"] else 'Solved'} {fname} ({n}x{n}): " \
             f"time= {format_elapsed(solver_statistics["runtime"])}")
     
     return {"run": run,
@@ -243,14 +292,53 @@ def _gather_satistics(run: int, path: str, puzzle: list, seed: int, solver: dict
     }
 
 
+def _gather_adaptive(path: str, puzzle: list, solver: dict, seeds: list, args: dict) -> list:
+    """ Repeat a solver run on a puzzle until the confidence interval of the median runtime is narrow enough
+
+    Args:
+        path (str): Path of the puzzle
+        puzzle (list): Puzzle to be ran
+        solver (dict): Solver to be used
+        seeds (list): Seeds to be used for each run
+        args (dict): CLI arguments given for the analyze command
+
+    Returns:
+        list: Statistics from each of the solver runs
+    """
+    results = []
+    runtimes = []
+    for run in range(args.max_runs):
+        # Generate a sub seed based on the general seed of this run
+        sub_seed = int(hashlib.sha256("|".join(map(str, [seeds[run], puzzle, solver])).encode()).hexdigest()[:8], 16)
+        result = _gather_satistics(run, path, puzzle, sub_seed, solver)
+        results.append(result)
+        runtimes.append(result["statistics"]["runtime"])
+
+        if len(runtimes) < args.min_runs:
+            continue
+        low, high = median_confidence_interval(runtimes, args.confidence)
+        median = np.median(runtimes)
+        if median > 0 and (high-low)/median <= args.ci_width:
+            break
+
+    # Record the number of runs that were needed for this puzzle and solver
+    for result in results:
+        result["runs"] = len(results)
+    return results
+
+
 def _analyze_command(args: dict) -> None:
     """ Command to analyze certain properties of the solver. Invoked through the CLI
 
     Args:
         args (dict): CLI arguments given for this command
     """
-    if not args.csv:
-        puzzles = _read_files(args.file, args.folder, args.recursive, args.strict, True)
+    if not args.csv and not args.csv_dir and not args.database:
+        # Puzzles are streamed in every run, only their number is needed up front for the seeds
+        num_puzzles = _count_puzzles(args.file, args.folder, args.recursive)
+        def puzzles():
+            return _iter_files(args.file, args.folder, args.recursive, args.strict, True)
+    _set_fallback(args)
     
     results = []
     if args.csv:
@@ -258,20 +346,52 @@ def _analyze_command(args: dict) -> None:
             paths = args.csv
         else:
             paths = [args.csv]
-        for path in paths:
-            results.extend(read_csv(path))
+        if args.analysis in FRAME_ANALYSES:
+            results = pd.concat([read_csv_frame(path) for path in paths], ignore_index=True)
+        else:
+            for path in paths:
+                results.extend(read_csv(path))
     elif args.csv_dir:
         if isinstance(args.csv_dir, list):
             paths = args.csv_dir
         else:
             paths = [args.dsv_dir]
-        for path in paths:
-            results.extend(read_csv_folder(path, args.strict, args.recursive))
+        if args.analysis in FRAME_ANALYSES:
+            results = pd.concat([read_csv_folder_frame(path, args.recursive) for path in paths], ignore_index=True)
+        else:
+            for path in paths:
+                results.extend(read_csv_folder(path, args.strict, args.recursive))
+    elif args.database:
+        # Let the database group the runs of every puzzle when the analysis only needs their medians
+        if args.analysis in GROUPED_ANALYSES:
+            results = read_grouped_results(args.database)
+        else:
+            results = read_results(args.database)
+    elif args.adaptive:
+        if not 0 < args.confidence < 1:
+            sys.exit(f"Error: The confidence level must be between 0 and 1, got {args.confidence}")
+        if args.ci_width <= 0:
+            sys.exit(f"Error: The relative width of the confidence interval must be positive, got {args.ci_width}")
+        # Below this number of runs the confidence interval of the median is unbounded, so the runs can never stop earlier
+        bounded_runs = median_confidence_min_runs(args.confidence)
+        if args.max_runs < bounded_runs:
+            sys.exit(f"Error: The maximum number of runs must be at least {bounded_runs} to bound the confidence interval at confidence level {args.confidence}")
+        if args.min_runs is None:
+            args.min_runs = bounded_runs
+        if args.min_runs < 1 or args.min_runs > args.max_runs:
+            sys.exit(f"Error: The minimum number of runs must be between 1 and the maximum number of runs ({args.max_runs}), got {args.min_runs}")
+
+        # Generate a reproducable seed for each of the possible runs
+        seeds = [int(hashlib.sha256("|".join(map(str, [run, args.max_runs, num_puzzles, len(args.solvers)])).encode()).hexdigest()[:8], 16)
+                 for run in range(args.max_runs)]
+        for path, puzzle, _ in puzzles():
+            for solver in args.solvers:
+                results.extend(_gather_adaptive(path, puzzle, solver, seeds, args))
     else:
         for run in range(args.runs):
             # Generate a reproducable seed to be used for all solvers in this run
-            seed = int(hashlib.sha256("|".join(map(str, [run, args.runs, len(puzzles), len(args.solvers)])).encode()).hexdigest()[:8], 16)
-            for path, puzzle, _ in puzzles:
+            seed = int(hashlib.sha256("|".join(map(str, [run, args.runs, num_puzzles, len(args.solvers)])).encode()).hexdigest()[:8], 16)
+            for path, puzzle, _ in puzzles():
                 for solver in args.solvers:
                     # Generate a sub seed based on the general seed
                     sub_seed = int(hashlib.sha256("|".join(map(str, [seed, puzzle, solver])).encode()).hexdigest()[:8], 16)
@@ -290,10 +410,299 @@ def _analyze_command(args: dict) -> None:
         rq3.run_all(results, k_out=1.5, k_fout=3.0)
     if args.analysis == "write_csv":
         write_csv(results, CSV_FOLDER)
+    if args.analysis == "write_db":
+        conn = connect(args.out_db)
+        insert_results(conn, results)
+        conn.close()
+        print(f"Stored {len(results)} results in {args.out_db}")
     if args.analysis == "qq":
         plots.plot_qq_runtime(results, "qf_ia", 25)
 
 
+def _pipeline_command(args: dict) -> None:
+    """ Command to generate, verify and solve fresh puzzles, recording every result as soon as it arrives. Invoked through the CLI
+
+    Generation and solving run in separate process pools. New puzzles are only generated while fewer than
+    queue_size solver tasks are waiting or running, so memory stays flat when solving is the bottleneck.
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    _set_fallback(args)
+    options = {"oracle": args.oracle}
+    work = iter([(n, seed) for n, seeds in generator.spawn_seeds(args.manifest, args.seed) for seed in seeds])
+    generating = set()
+    solving = set()
+    waiting = deque()
+    generated = 0
+    recorded = 0
+    first_result = None
+    exhausted = False
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.generate_workers) as generate_pool, ProcessPoolExecutor(max_workers=args.solve_workers) as solve_pool:
+        while True:
+            # Only produce new puzzles while the queue of solver tasks has space
+            while not exhausted and len(generating) < args.generate_workers and len(waiting)+len(solving) < args.queue_size:
+                item = next(work, None)
+                if item is None:
+                    exhausted = True
+                    break
+                n, seed = item
+                generating.add(generate_pool.submit(generator.generate_puzzle, None, n, seed, options))
+            while waiting and len(solving) < args.solve_workers:
+                solving.add(solve_pool.submit(_gather_satistics, *waiting.popleft()))
+
+            if not generating and not solving:
+                break
+            done, _ = wait(generating | solving, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in generating:
+                    generating.remove(future)
+                    path, grid, _ = future.result()
+                    generated += 1
+                    puzzle = grid.tolist()
+                    for run in range(args.runs):
+                        for solver in args.solvers:
+                            # Generate a reproducable seed based on the run, the puzzle and the solver
+                            sub_seed = int(hashlib.sha256("|".join(map(str, [run, args.runs, puzzle, solver["name"]])).encode()).hexdigest()[:8], 16)
+                            waiting.append((run, os.path.abspath(path), puzzle, sub_seed, solver))
+                else:
+                    solving.remove(future)
+                    append_csv(future.result(), args.out_dir)
+                    recorded += 1
+                    if first_result is None:
+                        first_result = time.perf_counter()-start
+
+    print(f"Generated {generated} puzzles and recorded {recorded} results in {format_elapsed(time.perf_counter()-start)}" \
+          f"{f' (first result after {format_elapsed(first_result)})' if first_result is not None else ''}")
+
+
+def _audit_file(path: str, oracle: str|None) -> dict:
+    """ Audits a single puzzle file for validity and uniqueness
+
+    Args:
+        path (str): Path to the puzzle file, or to a puzzle inside a packed corpus
+        oracle (str | None): Uniqueness oracle of the generator, the calibrated oracle for the size of the puzzle if None
+
+    Returns:
+        dict: Verdict containing flags for a valid file, a solution, a unique solution and an oracle timeout, and the reason if any of them failed
+    """
+    verdict = {"valid": False, "solution": False, "unique": False, "timeout": False, "reason": None}
+    try:
+        _, puzzle, _ = read_puzzle(path, True)
+    except SystemExit as e:
+        # The reader exits on malformed files, which is a verdict instead of an error for an audit
+        verdict["reason"] = str(e)
+        return verdict
+
+    n = len(puzzle)
+    if any(not 1 <= value <= n for row in puzzle for value in row):
+        verdict["reason"] = f"Numbers outside of 1..{n}"
+        return verdict
+    verdict["valid"] = True
+
+    try:
+        verdict["solution"], verdict["unique"] = generator.get_oracle(oracle or generator.select_oracle(n))(np.array(puzzle))
+    except generator.OracleTimeout as e:
+        # Neither the solution nor the uniqueness is known, so the puzzle is not reported as unsolvable
+        verdict["timeout"] = True
+        verdict["reason"] = f"Timeout: {e}"
+        return verdict
+    if not verdict["solution"]:
+        verdict["reason"] = "No solution"
+    elif not verdict["unique"]:
+        verdict["reason"] = "Multiple solutions"
+    return verdict
+
+
+def _audit_key(digest: str, n: int|None, oracle: str|None) -> str:
+    """ Builds the cache key of an audit verdict, so verdicts of different oracles are cached separately
+
+    Args:
+        digest (str): Hash of the puzzle
+        n (int | None): Size of the puzzle, None if it cannot be read
+        oracle (str | None): Uniqueness oracle of the generator, the calibrated oracle for the size of the puzzle if None
+
+    Returns:
+        str: Key of the verdict in the audit cache
+    """
+    if oracle is None and n is not None:
+        oracle = generator.select_oracle(n)
+    return f"{oracle or 'calibrated'}:{digest}"
+
+
+def _audit_command(args: dict) -> None:
+    """ Command to audit a corpus for malformed, unsolvable and non-unique puzzles. Invoked through the CLI
+
+    Verdicts are cached by the oracle and the hash of the file contents, so a re-audit only checks new or changed files.
+    Timeouts are reported separately and are not cached, so they are checked again on the next audit.
+    Packed corpora are audited per puzzle, hashing the grid of every puzzle instead of the file contents.
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    files = list(args.file or [])
+    for folder in args.folder or []:
+        files.extend(list_files(folder, args.recursive, True, True))
+
+    paths = []
+    digests = {}
+    keys = {}
+    for file in files:
+        if not os.path.exists(file):
+            sys.exit(f"Error: File does not exist at {file}")
+        if os.path.splitext(file)[1].lower() in PACK_EXTENSIONS:
+            for path, puzzle, _ in read_pack(file):
+                paths.append(path)
+                digests[path] = hashlib.sha256(json.dumps(puzzle).encode()).hexdigest()
+                keys[path] = _audit_key(digests[path], len(puzzle), args.oracle)
+            continue
+
+        with open(file, "rb") as f:
+            data = f.read()
+        try:
+            # The size is the first line of a puzzle file, the oracle for it is needed before the file is parsed
+            n = int(data.split(b"\n", 1)[0])
+        except ValueError:
+            n = None
+        paths.append(file)
+        digests[file] = hashlib.sha256(data).hexdigest()
+        keys[file] = _audit_key(digests[file], n, args.oracle)
+    if not paths:
+        sys.exit(f"Error: No puzzle files found")
+
+    cache = {}
+    if os.path.exists(args.cache):
+        with open(args.cache, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    todo = sorted({keys[path]: path for path in paths if keys[path] not in cache}.items())
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        verdicts = executor.map(_audit_file, [path for _, path in todo], [args.oracle]*len(todo), chunksize=16)
+        checked = dict(zip((key for key, _ in todo), verdicts))
+    cache.update({key: verdict for key, verdict in checked.items() if not verdict["timeout"]})
+
+    with open(args.cache, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+
+    report = {"checked": len(todo), "cached": len(paths)-len(todo), "invalid": [], "timeout": [], "no_solution": [], "non_unique": []}
+    for path in paths:
+        verdict = checked.get(keys[path]) or cache[keys[path]]
+        entry = {"path": path, "sha256": digests[path], "reason": verdict["reason"]}
+        if not verdict["valid"]:
+            report["invalid"].append(entry)
+        elif verdict.get("timeout"):
+            report["timeout"].append(entry)
+        elif not verdict["solution"]:
+            report["no_solution"].append(entry)
+        elif not verdict["unique"]:
+            report["non_unique"].append(entry)
+
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Audited {len(paths)} puzzles ({report['checked']} checked, {report['cached']} cached) in {format_elapsed(time.perf_counter()-start)}: " \
+          f"{len(report['invalid'])} invalid, {len(report['timeout'])} timed out, {len(report['no_solution'])} without solution, {len(report['non_unique'])} not unique")
+
+
+def _pack_command(args: dict) -> None:
+    """ Command to pack puzzle files into a single packed corpus. Invoked through the CLI
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    puzzles = []
+    for file in args.file or []:
+        _, puzzle, seed = read_puzzle(file, args.strict)
+        puzzles.append((os.path.basename(file), puzzle, seed))
+    for folder in args.folder or []:
+        # Puzzles keep their path relative to the folder, e.g. 5x5/name.singles
+        for path, puzzle, seed in read_puzzle_dir(folder, args.recursive, args.strict):
+            puzzles.append((os.path.relpath(path, folder).replace(os.sep, "/"), puzzle, seed))
+    write_pack(args.output, puzzles)
+    print(f"Packed {len(puzzles)} puzzles into {args.output}")
+
+
+def _unpack_command(args: dict) -> None:
+    """ Command to unpack a packed corpus into puzzle files. Invoked through the CLI
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    puzzles = read_pack(args.pack)
+    for path, puzzle, seed in puzzles:
+        out_path = os.path.join(args.output, os.path.relpath(path, args.pack))
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        write_file(out_path, puzzle, seed, None)
+    print(f"Unpacked {len(puzzles)} puzzles into {args.output}")
+
+
+def _store_command(args: dict) -> None:
+    """ Command to import csv results into the results database or export them back. Invoked through the CLI
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    if args.action == "import":
+        if not args.csv:
+            sys.exit("Error: No csv files or folders given to import")
+        count = import_csv(args.database, args.csv)
+        print(f"Imported {count} results into {args.database}")
+    else:
+        count = export_csv(args.database, args.out_dir)
+        print(f"Exported {count} results to {args.out_dir}")
+
+
+def _rescore_command(args: dict) -> None:
+    """ Command to rescore csv results with another PAR multiplier or a lower cutoff, without solving again. Invoked through the CLI
+
+    Args:
+        args (dict): CLI arguments given for this command
+    """
+    if args.multiplier < 1:
+        sys.exit(f"Error: The PAR multiplier must be at least 1, got {args.multiplier}")
+    if args.cutoff is not None and args.cutoff <= 0:
+        sys.exit(f"Error: The cutoff must be positive, got {args.cutoff}")
+
+    # Every csv file is written to the output folder, keeping its place relative to the given folder
+    targets = []
+    for file in args.csv or []:
+        targets.append((file, os.path.join(args.out_dir, os.path.basename(file))))
+    for folder in args.csv_dir or []:
+        if not os.path.isdir(folder):
+            sys.exit(f"Error: Not a directory at {folder}")
+        for root, dirs, files in os.walk(folder):
+            if not args.recursive:
+                dirs.clear()
+            for name in sorted(files):
+                if name.endswith(".csv"):
+                    file = os.path.join(root, name)
+                    targets.append((file, os.path.join(args.out_dir, os.path.relpath(file, folder))))
+
+    budget = z3solver.TIMEOUT/1000
+    for file, out_path in targets:
+        timeouts = rescore_csv(file, out_path, args.multiplier, budget, args.cutoff)
+        print(f"Rescored {file} with {timeouts} timeouts to {out_path}")
+
+
+def _parse_manifest_entry(entry: str) -> tuple[int, int]:
+    """ Parses a size:count pair of the manifest argument
+
+    Args:
+        entry (str): Argument for a size and the number of puzzles of that size
+
+    Raises:
+        argparse.ArgumentTypeError: If the entry is not a size:count pair
+
+    Returns:
+        tuple[int, int]: Tuple containing the size and the number of puzzles
+    """
+    try:
+        return generator.parse_manifest_entry(entry)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Manifest entries must be size:count pairs, got {entry}")
+
 def _parse_solver_specs(solver: str) -> dict:
     """ Parses the solver argument
 
@@ -301,28 +710,15 @@ def _parse_solver_specs(solver: str) -> dict:
         solver (str): Argument for solver to be used
 
     Raises:
-        argparse.ArgumentTypeError: _description_
-        argparse.ArgumentTypeError: _description_
-        argparse.ArgumentTypeError: _description_
+        argparse.ArgumentTypeError: If the solver specification is not valid
 
     Returns:
-        dict: _description_
+        dict: Solver specification containing the base, constraints and name of the solver
     """
-    parts = [i for i in solver.split("+") if i]
-    if not parts:
-        raise argparse.ArgumentTypeError("Empty solver specification")
-    
-    base = parts[0]
-    constraints = parts[1:]
-
-    if base not in SOLVERS:
-        raise argparse.ArgumentTypeError(f"Unknown base solver: {base}")
-    
-    unknown = [i for i in constraints if i not in CONSTRAINTS]
-    if unknown:
-        raise argparse.ArgumentTypeError(f"Unknown constraints: {', '.join(unknown)}")
-    
-    return {"base": SOLVERS[base], "constraints": [CONSTRAINTS[i] for i in constraints], "name": solver}
+    try:
+        return parse_spec(solver)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Hitori SMT solver and checker")
@@ -336,7 +732,8 @@ if __name__ == "__main__":
     solve_parser.add_argument("-r", "--recursive", action="store_true", help="Recursively read subfolders")
     solve_parser.add_argument("-s", "--strict", action="store_true", help="Exit when wrong file type is found")
     solve_parser.add_argument("-w", "--write", action="store_true", help="Write to file")
-    solve_parser.add_argument("solvers", nargs="+", type=_parse_solver_specs, help="One or more solver variants to run")
+    solve_parser.add_argument("-nf", "--native_fallback", default="lazy", choices=[i for i in SOLVERS if i != "native"], help="Base solver used when the native solver exceeds its node budget")
+    solve_parser.add_argument("solvers", nargs="+", type=_parse_solver_specs, help="One or more solver variants to run as base+constraint+..., +ws adds a warm start on the plain SMT solver, +ss uses the plain SMT solver without one as its control")
     solve_parser.set_defaults(func=_solve_command)
 
     # Command for checking puzzles
@@ -357,15 +754,83 @@ if __name__ == "__main__":
     group_analyze.add_argument("-d", "--folder", action="append", type=str, help="Path to folder containing puzzle files")
     group_analyze.add_argument("-e", "--csv", action="append", type=str, help="Path to csv file")
     group_analyze.add_argument("-ed", "--csv_dir", action="append", type=str, help="Path to csv folder")
+    group_analyze.add_argument("-db", "--database", type=str, help="Path to a results database")
     analyze_parser.add_argument("-r", "--recursive", action="store_true", help="Recursively read subfolders")
     analyze_parser.add_argument("-s", "--strict", action="store_true", help="Exit when wrong file type is found")
     analyze_parser.add_argument("-i", "--runs", default=1, type=int, help="Number of runs to complete")
+    analyze_parser.add_argument("-a", "--adaptive", action="store_true", help="Repeat runs until the confidence interval of the median runtime is narrow enough")
+    analyze_parser.add_argument("-imin", "--min_runs", default=None, type=int, help="Minimum number of runs in adaptive mode, defaults to the smallest number of runs with a bounded confidence interval (6 at a confidence level of 0.95)")
+    analyze_parser.add_argument("-imax", "--max_runs", default=20, type=int, help="Maximum number of runs in adaptive mode")
+    analyze_parser.add_argument("-cw", "--ci_width", default=0.1, type=float, help="Relative width of the confidence interval of the median runtime to stop at in adaptive mode")
+    analyze_parser.add_argument("-cl", "--confidence", default=0.95, type=float, help="Confidence level of the interval in adaptive mode")
     analyze_parser.add_argument("-th", "--hard_threshold", default=3.0, type=float, help="Threshold for hard difficulty score")
     analyze_parser.add_argument("-te", "--easy_threshold", default=3.0, type=float, help="Threshold for easy difficulty score")
     analyze_parser.add_argument("-p", "--print", action="store_true", help="Print difficult puzzles to terminal")
     analyze_parser.add_argument("-c", "--copy", type=str, help="Copy difficult puzzles to new relative folder")
-    analyze_parser.add_argument("solvers", nargs="+", type=_parse_solver_specs, help="Solver(s) used to run analysis")
+    analyze_parser.add_argument("-nf", "--native_fallback", default="lazy", choices=[i for i in SOLVERS if i != "native"], help="Base solver used when the native solver exceeds its node budget")
+    analyze_parser.add_argument("-o", "--out_db", default=RESULTS_DB, type=str, help="Results database to store the results in for write_db")
+    analyze_parser.add_argument("solvers", nargs="+", type=_parse_solver_specs, help="Solver(s) used to run analysis as base+constraint+..., +ws adds a warm start on the plain SMT solver, +ss uses the plain SMT solver without one as its control")
     analyze_parser.set_defaults(func=_analyze_command)
 
+    # Command for generating and solving fresh puzzles in one streaming pipeline
+    pipeline_parser = subparsers.add_parser("pipeline", help="Generate, verify and solve fresh puzzles, recording results as they arrive")
+    pipeline_parser.add_argument("-M", "--manifest", nargs="+", required=True, type=_parse_manifest_entry, help="Sizes and counts to generate as size:count pairs, e.g. 5:100 10:50")
+    pipeline_parser.add_argument("-sd", "--seed", default=None, type=int, help="Root seed for generation, every puzzle uses a stream spawned from it")
+    pipeline_parser.add_argument("-i", "--runs", default=1, type=int, help="Number of runs per puzzle and solver")
+    pipeline_parser.add_argument("-o", "--oracle", default=None, type=str, help="Uniqueness oracle of the generator (defaults to the calibrated oracle for each size)")
+    pipeline_parser.add_argument("-gw", "--generate_workers", default=max(1, (os.cpu_count() or 1)//2), type=int, help="Number of generator processes")
+    pipeline_parser.add_argument("-sw", "--solve_workers", default=max(1, (os.cpu_count() or 1)//2), type=int, help="Number of solver processes")
+    pipeline_parser.add_argument("-q", "--queue_size", default=16, type=int, help="Maximum number of waiting and running solver tasks before generation pauses")
+    pipeline_parser.add_argument("-od", "--out_dir", default=CSV_FOLDER, type=str, help="Folder the results are appended to, one csv per solver")
+    pipeline_parser.add_argument("-nf", "--native_fallback", default="lazy", choices=[i for i in SOLVERS if i != "native"], help="Base solver used when the native solver exceeds its node budget")
+    pipeline_parser.add_argument("solvers", nargs="+", type=_parse_solver_specs, help="Solver(s) to run on the generated puzzles as base+constraint+..., +ws adds a warm start on the plain SMT solver, +ss uses the plain SMT solver without one as its control")
+    pipeline_parser.set_defaults(func=_pipeline_command)
+
+    # Command for auditing a corpus
+    audit_parser = subparsers.add_parser("audit", help="Check that every puzzle in a corpus parses, has a solution and has exactly one")
+    group_audit = audit_parser.add_mutually_exclusive_group(required=True)
+    group_audit.add_argument("-f", "--file", action="append", type=str, help="Path to a puzzle file")
+    group_audit.add_argument("-d", "--folder", action="append", type=str, help="Path to folder containing puzzle files")
+    audit_parser.add_argument("-r", "--recursive", action="store_true", help="Recursively read subfolders")
+    audit_parser.add_argument("-o", "--oracle", default=None, type=str, help="Uniqueness oracle of the generator (defaults to the calibrated oracle for each size)")
+    audit_parser.add_argument("-w", "--workers", default=None, type=int, help="Number of worker processes (defaults to the number of cores)")
+    audit_parser.add_argument("-c", "--cache", default=AUDIT_CACHE, type=str, help="Path to the cache of verdicts")
+    audit_parser.add_argument("-rp", "--report", default="audit.json", type=str, help="Path to write the report of invalid, timed out, unsolvable and non-unique puzzles to")
+    audit_parser.set_defaults(func=_audit_command)
+
+    # Commands for packing a corpus into a single file and back
+    pack_parser = subparsers.add_parser("pack", help="Pack puzzle files into a single packed corpus")
+    group_pack = pack_parser.add_mutually_exclusive_group(required=True)
+    group_pack.add_argument("-f", "--file", action="append", type=str, help="Path to a puzzle file")
+    group_pack.add_argument("-d", "--folder", action="append", type=str, help="Path to folder containing puzzle files")
+    pack_parser.add_argument("-r", "--recursive", action="store_true", help="Recursively read subfolders")
+    pack_parser.add_argument("-s", "--strict", action="store_true", help="Exit when wrong file type is found")
+    pack_parser.add_argument("output", type=str, help="Path of the packed corpus, e.g. rq3.singlespack")
+    pack_parser.set_defaults(func=_pack_command)
+
+    unpack_parser = subparsers.add_parser("unpack", help="Unpack a packed corpus into puzzle files")
+    unpack_parser.add_argument("pack", type=str, help="Path to the packed corpus")
+    unpack_parser.add_argument("output", type=str, help="Folder to write the puzzle files to")
+    unpack_parser.set_defaults(func=_unpack_command)
+
+    # Command for moving results between csv files and the results database
+    store_parser = subparsers.add_parser("store", help="Import csv results into the results database or export them to csv files")
+    store_parser.add_argument("action", choices=["import", "export"], help="Import csv files into the database or export the database to csv files")
+    store_parser.add_argument("-e", "--csv", nargs="+", type=str, help="Csv files or folders to import")
+    store_parser.add_argument("-db", "--database", default=RESULTS_DB, type=str, help="Path to the results database")
+    store_parser.add_argument("-od", "--out_dir", default=CSV_FOLDER, type=str, help="Folder to export the csv files to, one csv per solver")
+    store_parser.set_defaults(func=_store_command)
+
+    # Command for rescoring stored results with another penalty
+    rescore_parser = subparsers.add_parser("rescore", help="Rescore csv results with another PAR multiplier or a lower cutoff without solving again")
+    rescore_parser.add_argument("multiplier", type=float, help="PAR multiplier k, a timed out result scores k times the budget")
+    group_rescore = rescore_parser.add_mutually_exclusive_group(required=True)
+    group_rescore.add_argument("-e", "--csv", action="append", type=str, help="Path to csv file")
+    group_rescore.add_argument("-ed", "--csv_dir", action="append", type=str, help="Path to csv folder")
+    rescore_parser.add_argument("-r", "--recursive", action="store_true", help="Recursively read subfolders")
+    rescore_parser.add_argument("-c", "--cutoff", default=None, type=float, help="Lower budget in seconds, results at or above it count as timed out")
+    rescore_parser.add_argument("-od", "--out_dir", default=RESCORED_FOLDER, type=str, help="Folder to write the rescored csv files to")
+    rescore_parser.set_defaults(func=_rescore_command)
+
     args = parser.parse_args()
     args.func(args)
\ No newline at end of file
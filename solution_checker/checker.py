@@ -1,4 +1,5 @@
-from collections import deque
+import numpy as np
+import utils.bitboard as bitboard
 
 # This solution checker was made as part of the collaboration of this project
 # The original author of this specific implementation is Sophieke van Luenen (https://github.com/Sophieke32) and can be found in:
@@ -14,49 +15,89 @@ def check_puzzle(solution: list) -> bool:
         bool: True if the solution is valid, False otherwise
     """
     n = len(solution)
-    rows = [set() for _ in range(n)]
-    cols = [set() for _ in range(n)]
-    num_white = 0
-    start = None
-
-    for i in range(n):
-        for j in range(n):
-            val = solution[i][j]
-            # Neighbour check
-            if val.endswith("B"):
-                if i+1 < n:
-                    if solution[i+1][j].endswith("B"):
-                        return False
-                if j+1 < n:
-                    if solution[i][j+1].endswith("B"):
-                        return False
-                continue
-            # Gather a root for the connectivity check
-            if start is None:
-                start = (i, j)
-
-            # Uniqueness check
-            if val in rows[i] or val in cols[j]:
-                return False
-            rows[i].add(val)
-            cols[j].add(val)
-            num_white += 1
-
-    if num_white == 0 or start is None:
+    colored = bitboard.from_matrix([[val.endswith("B") for val in row] for row in solution], n)
+    white = bitboard.full_mask(n) & ~colored
+
+    # Neighbour check
+    if bitboard.adjacent_violations(colored, n):
+        return False
+
+    if not white:
         return False
 
-    # Connectivity check
-    visited = set([start])
-    queue = deque([start])
-    while queue:
-        i, j = queue.popleft()
-        for di, dj in ((0, 1), (1, 0), (0, -1), (-1, 0)):
-            ni, nj = i+di, j+dj
-            if 0 <= ni < n and 0 <= nj < n:
-                if solution[ni][nj].endswith("B"):
-                    continue
-                if (ni, nj) not in visited:
-                    visited.add((ni, nj))
-                    queue.append((ni, nj))
-
-    return len(visited) == num_white
\ No newline at end of file
+    # Uniqueness check
+    row_duplicates, col_duplicates = bitboard.duplicate_masks(bitboard.value_boards(solution, n, white), n)
+    if row_duplicates or col_duplicates:
+        return False
+
+    # Connectivity check, starting from the first white cell
+    return bitboard.flood_fill(white & -white, white, n) == white
+
+
+def solutions_to_arrays(solutions: list) -> tuple[np.ndarray, np.ndarray]:
+    """ Stacks solutions of the same size into a value array and a colored mask
+
+    Args:
+        solutions (list): Solutions read from solution files, all of the same size
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: A (K, n, n) array of the numbers and a (K, n, n) boolean array of the colored cells
+    """
+    colored = np.array([[[val.endswith("B") for val in row] for row in solution] for solution in solutions], dtype=bool)
+    values = np.array([[[int(val.rstrip("B")) for val in row] for row in solution] for solution in solutions], dtype=np.int64)
+    return values, colored
+
+def check_puzzles(values: np.ndarray, colored: np.ndarray) -> tuple[np.ndarray, list]:
+    """ Checks the validity of a batch of solutions of the same size at once
+
+    Args:
+        values (np.ndarray): A (K, n, n) array of the numbers in the solutions
+        colored (np.ndarray): A (K, n, n) boolean array of the colored cells in the solutions
+
+    Returns:
+        tuple[np.ndarray, list]: A boolean array with a verdict per solution and a list of failure reasons (None if valid)
+    """
+    k, n, _ = values.shape
+    white = ~colored
+
+    # Neighbour check
+    adjacent = (colored[:, 1:, :] & colored[:, :-1, :]).any(axis=(1, 2)) | (colored[:, :, 1:] & colored[:, :, :-1]).any(axis=(1, 2))
+
+    # Uniqueness check, colored cells are given a value that never collides with a white cell
+    whites = np.where(white, values, -np.arange(1, n*n+1).reshape(n, n))
+    rows = np.sort(whites, axis=2)
+    cols = np.sort(whites, axis=1)
+    duplicates = (rows[:, :, 1:] == rows[:, :, :-1]).any(axis=(1, 2)) | (cols[:, 1:, :] == cols[:, :-1, :]).any(axis=(1, 2))
+
+    # Connectivity check by dilating from the first white cell of each solution until a fixpoint is reached
+    any_white = white.any(axis=(1, 2))
+    reached = np.zeros_like(white)
+    first = white.reshape(k, -1).argmax(axis=1)
+    reached.reshape(k, -1)[np.arange(k), first] = True
+    reached &= white
+    while True:
+        grown = reached.copy()
+        grown[:, 1:, :] |= reached[:, :-1, :]
+        grown[:, :-1, :] |= reached[:, 1:, :]
+        grown[:, :, 1:] |= reached[:, :, :-1]
+        grown[:, :, :-1] |= reached[:, :, 1:]
+        grown &= white
+        if np.array_equal(grown, reached):
+            break
+        reached = grown
+    disconnected = (reached != white).any(axis=(1, 2))
+
+    reasons = []
+    for i in range(k):
+        if not any_white[i]:
+            reasons.append("no white cells")
+        elif adjacent[i]:
+            reasons.append("adjacent colored cells")
+        elif duplicates[i]:
+            reasons.append("duplicate numbers")
+        elif disconnected[i]:
+            reasons.append("disconnected white cells")
+        else:
+            reasons.append(None)
+    verdicts = np.array([reason is None for reason in reasons], dtype=bool)
+    return verdicts, reasons
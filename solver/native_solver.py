@@ -0,0 +1,303 @@
+import sys
+import utils.bitboard as bitboard
+
+# Maximum number of search nodes before the native solver gives up
+NODE_BUDGET = 20000
+
+class _BudgetExceeded(Exception):
+    """ Raised when the search exceeds its node budget """
+
+
+def _initial_state(puzzle: list, n: int) -> tuple[int, int]:
+    """ Applies the deductions of the redundant constraints that hold before any search
+
+    Args:
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        n (int): Size of the puzzle
+
+    Returns:
+        tuple[int, int]: Bitboards of the white and colored cells
+    """
+    white = 0
+    colored = 0
+    row_duplicates, col_duplicates = bitboard.duplicate_masks(bitboard.value_boards(puzzle, n), n)
+
+    # Cells without duplicates can always be white without invalidating a solution
+    white |= bitboard.full_mask(n) & ~(row_duplicates | col_duplicates)
+
+    for i in range(n):
+        for j in range(n):
+            # Sandwich pair: a cell between two equal numbers is white
+            if j+2 < n and puzzle[i][j] == puzzle[i][j+2]:
+                white |= bitboard.bit(i, j+1, n)
+            if i+2 < n and puzzle[i][j] == puzzle[i+2][j]:
+                white |= bitboard.bit(i+1, j, n)
+            # Sandwich triple: the outer cells of three equal numbers are colored
+            if j+2 < n and puzzle[i][j] == puzzle[i][j+1] == puzzle[i][j+2]:
+                colored |= bitboard.bit(i, j, n) | bitboard.bit(i, j+2, n)
+            if i+2 < n and puzzle[i][j] == puzzle[i+1][j] == puzzle[i+2][j]:
+                colored |= bitboard.bit(i, j, n) | bitboard.bit(i+2, j, n)
+
+    # Pair isolation: all other occurences of a number next to an equal number are colored
+    for i in range(n):
+        for j in range(n-1):
+            if puzzle[i][j] == puzzle[i][j+1]:
+                for k in range(n):
+                    if k not in (j, j+1) and puzzle[i][k] == puzzle[i][j]:
+                        colored |= bitboard.bit(i, k, n)
+            if puzzle[j][i] == puzzle[j+1][i]:
+                for k in range(n):
+                    if k not in (j, j+1) and puzzle[k][i] == puzzle[j][i]:
+                        colored |= bitboard.bit(k, i, n)
+    return white, colored
+
+
+def _peers(puzzle: list, n: int) -> list:
+    """ Finds, for every cell, the other cells with the same number in its row and column
+
+    Args:
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        n (int): Size of the puzzle
+
+    Returns:
+        list: Bitboard of the peers for every cell index
+    """
+    peers = [0]*(n*n)
+    for i in range(n):
+        for j in range(n):
+            board = 0
+            for k in range(n):
+                if k != j and puzzle[i][k] == puzzle[i][j]:
+                    board |= bitboard.bit(i, k, n)
+                if k != i and puzzle[k][j] == puzzle[i][j]:
+                    board |= bitboard.bit(k, j, n)
+            peers[i*n+j] = board
+    return peers
+
+
+def _articulation_points(mask: int, n: int) -> int:
+    """ Finds the articulation points of the grid graph induced by the cells in the mask
+
+    Args:
+        mask (int): Bitboard of the cells in the graph
+        n (int): Size of the puzzle
+
+    Returns:
+        int: Bitboard of the articulation points
+    """
+    discovery = {}
+    low = {}
+    points = 0
+    counter = 0
+
+    def adjacent(index: int) -> list:
+        return [c[0]*n+c[1] for c in bitboard.cells(bitboard.neighbours(1 << index, n) & mask, n)]
+
+    remaining = mask
+    while remaining:
+        root = (remaining & -remaining).bit_length()-1
+        discovery[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+        # Iterative depth first search keeping the parent and the remaining neighbours of every node on the stack
+        stack = [(root, -1, iter(adjacent(root)))]
+        while stack:
+            node, parent, it = stack[-1]
+            child = next(it, None)
+            if child is None:
+                stack.pop()
+                if stack:
+                    above = stack[-1][0]
+                    low[above] = min(low[above], low[node])
+                    if stack[-1][1] != -1 and low[node] >= discovery[above]:
+                        points |= 1 << above
+                continue
+            if child == parent:
+                continue
+            if child in discovery:
+                low[node] = min(low[node], discovery[child])
+                continue
+            discovery[child] = low[child] = counter
+            counter += 1
+            if node == root:
+                root_children += 1
+            stack.append((child, node, iter(adjacent(child))))
+        if root_children > 1:
+            points |= 1 << root
+        remaining &= ~bitboard.flood_fill(1 << root, mask, n)
+    return points
+
+
+def _whites_connected(white: int, colored: int, n: int) -> bool:
+    """ Checks if all white cells can still be connected through the cells that are not colored
+
+    Args:
+        white (int): Bitboard of the white cells
+        colored (int): Bitboard of the colored cells
+        n (int): Size of the puzzle
+
+    Returns:
+        bool: True if all white cells are in a single component of uncolored cells
+    """
+    if not white:
+        return True
+    reached = bitboard.flood_fill(white & -white, bitboard.full_mask(n) & ~colored, n, white)
+    return reached & white == white
+
+
+def _propagate(white: int, colored: int, peers: list, n: int, statistics: dict) -> tuple[int, int]|None:
+    """ Propagates the Hitori rules until a fixpoint is reached
+
+    Args:
+        white (int): Bitboard of the white cells
+        colored (int): Bitboard of the colored cells
+        peers (list): Bitboard of the peers for every cell index
+        n (int): Size of the puzzle
+        statistics (dict): Search statistics to update
+
+    Returns:
+        tuple[int, int]|None: Bitboards of the white and colored cells, or None if a conflict was found
+    """
+    full = bitboard.full_mask(n)
+    while True:
+        before = (white, colored)
+
+        # Neighbours of colored cells are white, peers of white cells are colored
+        white |= bitboard.neighbours(colored, n)
+        for (i, j) in bitboard.cells(white, n):
+            colored |= peers[i*n+j]
+        if white & colored or bitboard.adjacent_violations(colored, n):
+            return None
+        if not _whites_connected(white, colored, n):
+            return None
+
+        # An unknown cell that is an articulation point separating white cells must be white
+        unknown = full & ~white & ~colored
+        for (i, j) in bitboard.cells(_articulation_points(full & ~colored, n) & unknown, n):
+            b = bitboard.bit(i, j, n)
+            if not _whites_connected(white, colored | b, n):
+                white |= b
+
+        statistics["propagations"] += 1
+        if (white, colored) == before:
+            return white, colored
+
+
+def _choose_group(white: int, colored: int, puzzle: list, n: int) -> list:
+    """ Finds the most constrained group of equal numbers in a row or column that still has undecided cells
+
+    Args:
+        white (int): Bitboard of the white cells
+        colored (int): Bitboard of the colored cells
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        n (int): Size of the puzzle
+
+    Returns:
+        list: Bitboards of the undecided cells in the group, empty if every cell is decided
+    """
+    unknown = bitboard.full_mask(n) & ~white & ~colored
+    best = []
+    for line in range(2*n):
+        groups = {}
+        for k in range(n):
+            (i, j) = (line, k) if line < n else (k, line-n)
+            b = bitboard.bit(i, j, n)
+            if b & unknown:
+                groups.setdefault(puzzle[i][j], []).append(b)
+        for cells in groups.values():
+            if len(cells) >= 2 and (not best or len(cells) < len(best)):
+                best = cells
+    if best:
+        return best
+
+    # Only single undecided cells remain
+    return [unknown & -unknown] if unknown else []
+
+
+def _search(white: int, colored: int, puzzle: list, peers: list, n: int, statistics: dict, budget: int) -> tuple[int, int]|None:
+    """ Depth first search over the most constrained groups of equal numbers
+
+    Args:
+        white (int): Bitboard of the white cells
+        colored (int): Bitboard of the colored cells
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        peers (list): Bitboard of the peers for every cell index
+        n (int): Size of the puzzle
+        statistics (dict): Search statistics to update
+        budget (int): Maximum number of search nodes
+
+    Raises:
+        _BudgetExceeded: If the search exceeds the node budget
+
+    Returns:
+        tuple[int, int]|None: Bitboards of the white and colored cells of a solution, or None if there is none
+    """
+    statistics["decisions"] += 1
+    if statistics["decisions"] > budget:
+        raise _BudgetExceeded()
+
+    state = _propagate(white, colored, peers, n, statistics)
+    if state is None:
+        statistics["conflicts"] += 1
+        return None
+    white, colored = state
+
+    group = _choose_group(white, colored, puzzle, n)
+    if not group:
+        return white, colored
+
+    # Try each cell of the group as the white one, or color all of them
+    options = [(b, 0) for b in group] + [(0, sum(group))]
+    for (w, c) in options:
+        result = _search(white | w, colored | c, puzzle, peers, n, statistics, budget)
+        if result is not None:
+            return result
+    return None
+
+
+def solve(puzzle: list, budget: int = NODE_BUDGET) -> tuple[bool, list|None, dict|None, dict|None]|None:
+    """ Solves a puzzle using propagation and backtracking without an SMT solver
+
+    Args:
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        budget (int, optional): Maximum number of search nodes. Defaults to NODE_BUDGET.
+
+    Returns:
+        tuple[bool, list|None, dict|None, dict|None]|None: Tuple consisting of a Boolean to indicate a timeout, a solution grid and two dicts of statistics,
+            or None if the node budget was exceeded
+    """
+    n = len(puzzle)
+    statistics = {"propagations": 0, "conflicts": 0, "decisions": 0}
+    white, colored = _initial_state(puzzle, n)
+
+    try:
+        result = _search(white, colored, puzzle, _peers(puzzle, n), n, statistics, budget)
+    except _BudgetExceeded:
+        return None
+    if result is None:
+        sys.exit(f"Error: Could not find a satisfiable answer to the puzzle")
+
+    _, colored = result
+    solution = []
+    for i in range(n):
+        row = []
+        for j in range(n):
+            cell = str(puzzle[i][j])
+            if colored & bitboard.bit(i, j, n):
+                cell = f"{cell}B"
+            row.append(cell)
+        solution.append(row)
+
+    solver_statistics = {
+        "propagations": statistics["propagations"],
+        "rlimit_count": 0,
+        "conflicts": statistics["conflicts"],
+        "decisions": statistics["decisions"],
+        "memory": 0,
+        "max_memory": 0,
+        "encoding_size": {"int_vars": 0, "bool_vars": 0, "bv_vars": 0, "assertions": 0}
+    }
+    puzzle_statistics = {
+        "black_cells": colored.bit_count()
+    }
+    return False, solution, solver_statistics, puzzle_statistics
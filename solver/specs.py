@@ -0,0 +1,74 @@
+import solver.z3solver as z3solver
+import solver.z3solver_locals as z3solver_locals
+import solver.z3solver_globals as z3solver_globals
+
+# Solver specification option to seed the solver with a heuristic coloring, which also switches to the plain SMT solver
+WARM_START = "ws"
+# Solver specification option to use the plain SMT solver without a warm start, the control for WARM_START
+SIMPLE_SOLVER = "ss"
+
+# Available base solvers that can be called using the CLI
+SOLVERS = {
+    "qf_ia": z3solver.qf_ia,
+    "qf_ia_alt_u": z3solver.qf_ia_alt_u,
+    "qf_ia_alt_c": z3solver.qf_ia_alt_c,
+    "qf_ia_tree_c": z3solver.qf_ia_tree_c,
+    "qf_bv": z3solver.qf_bv,
+    "qf_bool": z3solver.boolean,
+    "qf_ia-c": z3solver.lazy,
+    "lazy": z3solver.lazy,
+    "qf_ia_external": z3solver.lazy,
+    "native": z3solver.native
+}
+
+# Available constraints that can be added using the CLI
+CONSTRAINTS = {
+    "wn": z3solver_locals.white_neighbours,
+    "cc": z3solver_locals.corner_close,
+    "st": z3solver_locals.sandwich_triple,
+    "sp": z3solver_locals.sandwich_pair,
+    "tc": z3solver_locals.triple_corner,
+    "qc": z3solver_locals.quad_corner,
+    "tep": z3solver_locals.triple_edge_pair,
+    "dep": z3solver_locals.double_edge_pair,
+    "ce": z3solver_locals.close_edge,
+    "fde": z3solver_locals.force_double_edge,
+    "bc": z3solver_locals.border_close,
+    "lw": z3solver_globals.least_whites,
+    "mb": z3solver_globals.most_blacks,
+    "pi": z3solver_globals.pair_isolation,
+    "ci": z3solver_globals.close_isolation,
+    "wb": z3solver_globals.white_bridges
+}
+
+
+def parse_spec(spec: str) -> dict:
+    """ Parses a solver specification of the form base+constraint+constraint
+
+    Args:
+        spec (str): Solver specification
+
+    Raises:
+        ValueError: If the specification is empty or contains an unknown base or constraint
+
+    Returns:
+        dict: Solver specification containing the base, constraints and name of the solver
+    """
+    parts = [i for i in spec.split("+") if i]
+    if not parts:
+        raise ValueError("Empty solver specification")
+    
+    base = parts[0]
+    warm_start = WARM_START in parts[1:]
+    # Initial values are rejected by the default combined solver, so a warm start always runs on the plain SMT solver
+    simple_solver = warm_start or SIMPLE_SOLVER in parts[1:]
+    constraints = [i for i in parts[1:] if i not in (WARM_START, SIMPLE_SOLVER)]
+
+    if base not in SOLVERS:
+        raise ValueError(f"Unknown base solver: {base}")
+    
+    unknown = [i for i in constraints if i not in CONSTRAINTS]
+    if unknown:
+        raise ValueError(f"Unknown constraints: {', '.join(unknown)}")
+    
+    return {"base": SOLVERS[base], "constraints": [CONSTRAINTS[i] for i in constraints], "warm_start": warm_start, "simple_solver": simple_solver, "fallback": None, "name": spec}
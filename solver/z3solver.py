@@ -1,60 +1,27 @@
 import sys
 import time
 import solver.z3solver_base as z3solver_base
+import solver.native_solver as native_solver
+import utils.bitboard as bitboard
 from z3 import * # type: ignore
 
 # Standard timeout of 10s used in every solver
 TIMEOUT = 10000
 
-def _find_white_components(white_cells: list, n: int) -> list:
-    """ Finds all groups of connected white cells in the grid
-
-    Args:
-        white_cells (list): List of Booleans describing the white and colored cells
-        n (int): Size of the puzzle
-
-    Returns:
-        list: List of all individual groups of connected white cells
-    """
-    visited = [[False]*n for _ in range(n)]
-    components = []
-
-    for i in range(n):
-        for j in range(n):
-            if white_cells[i][j] and not visited[i][j]:
-                stack = [(i, j)]
-                component = []
-                visited[i][j] = True
-                while stack:
-                    x, y = stack.pop()
-                    component.append((x, y))
-                    for (nx, ny) in [(x-1, y), (x+1, y), (x, y-1), (x, y+1)]:
-                        if 0 <= nx < n and 0 <= ny < n:
-                            if white_cells[nx][ny] and not visited[nx][ny]:
-                                visited[nx][ny] = True
-                                stack.append((nx, ny))
-                components.append(component)
-    return components
-
-
-def _add_constraint_connectivity_cut(s: Solver, component: list, colored: list, n: int) -> None:
+def _add_constraint_connectivity_cut(s: Solver, component: int, colored: list, n: int) -> None:
     """ Add a new constraint to disallow this pattern of disconnected white components from appearing again
 
     Args:
         s (Solver): Solver to add assertions to
-        component (list): List of all individual groups of connected white cells
+        component (int): Bitboard of a group of connected white cells
         colored (list): Matrix of BoolRef values for solver to fill
         n (int): Size of the puzzle
     """
     # Find the boundaries of each component
-    boundary = set()
-    for (i, j) in component:
-        for (ni, nj) in [(i-1, j), (i+1, j), (i, j-1), (i, j+1)]:
-            if 0 <= ni < n and 0 <= nj < n and (ni, nj) not in component:
-                boundary.add((ni, nj))
+    boundary = bitboard.neighbours(component, n) & ~component
     
     # Color a cell in the component or make a boundary cell white
-    s.add(Or(Or(colored[i][j] for (i, j) in component), Or(Not(colored[i][j]) for (i, j) in boundary)))
+    s.add(Or(Or([colored[i][j] for (i, j) in bitboard.cells(component, n)]), Or([Not(colored[i][j]) for (i, j) in bitboard.cells(boundary, n)])))
 
 
 def _solve(s: Solver, colored: list, puzzle: list, n: int, encoding_size: dict) -> tuple[bool, list|None, dict|None, dict|None]:
@@ -157,7 +124,7 @@ def _solve_lazy(s: Solver, colored: list, puzzle: list, n: int, encoding_size: d
         sat_model = [[z3.is_false(m.evaluate(colored[r][c])) for c in range(n)] for r in range(n)]
 
         # Find all white components based on this solution iteration
-        components = _find_white_components(sat_model, n)
+        components = bitboard.components(bitboard.from_matrix(sat_model, n), n)
         if len(components) <= 1:
             break
         
@@ -167,17 +134,115 @@ def _solve_lazy(s: Solver, colored: list, puzzle: list, n: int, encoding_size: d
     return _solve(s, colored, puzzle, n, encoding_size)
 
 
-def _init_solver(n: int, seed: int|None) -> tuple[Solver, list, dict]:
+def _heuristic_coloring(puzzle: list, n: int) -> list:
+    """ Computes a cheap heuristic coloring by greedily resolving duplicates while respecting the neighbours rule.
+    The result is not guaranteed to be a solution and is only used as a hint for the solver
+
+    Args:
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        n (int): Size of the puzzle
+
+    Returns:
+        list: Matrix of Booleans where True indicates a colored cell
+    """
+    colored = [[False]*n for _ in range(n)]
+    fixed_white = [[False]*n for _ in range(n)]
+
+    # A cell between two equal numbers is always white, the outer cells of a triple are always colored
+    for i in range(n):
+        for j in range(n-2):
+            if puzzle[i][j] == puzzle[i][j+2]:
+                fixed_white[i][j+1] = True
+            if puzzle[j][i] == puzzle[j+2][i]:
+                fixed_white[j+1][i] = True
+    for i in range(n):
+        for j in range(n-2):
+            if puzzle[i][j] == puzzle[i][j+1] == puzzle[i][j+2]:
+                colored[i][j] = colored[i][j+2] = True
+            if puzzle[j][i] == puzzle[j+1][i] == puzzle[j+2][i]:
+                colored[j][i] = colored[j+2][i] = True
+
+    # Count the duplicates of every cell in its row and column
+    duplicates = [[0]*n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            duplicates[i][j] = sum(1 for k in range(n) if k != j and puzzle[i][k] == puzzle[i][j]) + \
+                sum(1 for k in range(n) if k != i and puzzle[k][j] == puzzle[i][j])
+
+    # Resolve the most duplicated cells first
+    order = sorted(((i, j) for i in range(n) for j in range(n) if duplicates[i][j] > 0), key=lambda c: -duplicates[c[0]][c[1]])
+    for (i, j) in order:
+        if colored[i][j] or fixed_white[i][j]:
+            continue
+        v = puzzle[i][j]
+        conflict = any(k != j and not colored[i][k] and puzzle[i][k] == v for k in range(n)) or \
+            any(k != i and not colored[k][j] and puzzle[k][j] == v for k in range(n))
+        if not conflict:
+            continue
+        # Only color the cell if it does not have any colored neighbours
+        if any(0 <= ni < n and 0 <= nj < n and colored[ni][nj] for (ni, nj) in [(i-1, j), (i+1, j), (i, j-1), (i, j+1)]):
+            continue
+        colored[i][j] = True
+    return colored
+
+
+def _warm_start(s: Solver, colored: list, puzzle: list, n: int, base: Callable) -> None:
+    """ Seeds the phase of the solver with a heuristic coloring of the puzzle.
+    Rank variables of the integer ranking bases are seeded with the distance to the root in the heuristic coloring
+
+    Args:
+        s (Solver): Solver to set the initial values on
+        colored (list): Matrix of BoolRef values for solver to fill
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        n (int): Size of the puzzle
+        base (Callable): Base solver that is used
+    """
+    hint = _heuristic_coloring(puzzle, n)
+    for i in range(n):
+        for j in range(n):
+            s.set_initial_value(colored[i][j], hint[i][j])
+
+    # Names of the rank variables of the bases using an integer ranking for connectivity
+    rank_names = {qf_ia: "num", qf_ia_alt_u: "num", qf_ia_alt_c: "rank", qf_ia_tree_c: "rank"}
+    if base not in rank_names or n < 2:
+        return
+
+    # The root is located at either (0, 0) or (0, 1), as the neighbours rule does not allow both to be black
+    root = (0, 0) if not hint[0][0] else (0, 1)
+    if hint[root[0]][root[1]]:
+        return
+    distance = {root: 0}
+    queue = [root]
+    for (i, j) in queue:
+        for (ni, nj) in [(i-1, j), (i+1, j), (i, j-1), (i, j+1)]:
+            if 0 <= ni < n and 0 <= nj < n and not hint[ni][nj] and (ni, nj) not in distance:
+                distance[(ni, nj)] = distance[(i, j)]+1
+                queue.append((ni, nj))
+
+    name = rank_names[base]
+    for i in range(n):
+        for j in range(n):
+            if hint[i][j]:
+                s.set_initial_value(Int(f"{name}_{i}_{j}"), -1)
+            elif (i, j) in distance:
+                s.set_initial_value(Int(f"{name}_{i}_{j}"), distance[(i, j)])
+    if name == "rank":
+        s.set_initial_value(Bool(f"root_{root[0]}_{root[1]}"), True)
+
+
+def _init_solver(n: int, seed: int|None, simple_solver: bool = False) -> tuple[Solver, list, dict]:
     """ Initialize a new solver
 
     Args:
         n (int): Size of the puzzle
         seed (int | None): Seed for this solver
+        simple_solver (bool, optional): Flag to use the plain SMT solver instead of the default combined solver, required for initial values. Defaults to False.
 
     Returns:
         tuple[Solver, list, dict]: Tuple containing the solver instance, a list of Boolean variables for the solution and a dict containing the encoding sizes
     """
-    s = Solver()
+    # Initial values are only supported by the SMT solver, not by the default combined solver
+    s = SimpleSolver() if simple_solver else Solver()
     encoding_size = { "int_vars": 0, "bool_vars": 0, "bv_vars": 0 }
     s.set("timeout", TIMEOUT)
     s.set("threads", 1)
@@ -190,7 +255,8 @@ def _init_solver(n: int, seed: int|None) -> tuple[Solver, list, dict]:
     return s, colored, encoding_size
 
 
-def solve(base: Callable, constraints: list, puzzle: list, seed: int|None = None) -> tuple[bool, list|None, dict|None, dict|None]:
+def solve(base: Callable, constraints: list, puzzle: list, seed: int|None = None, warm_start: bool = False, fallback: Callable|None = None,
+          simple_solver: bool = False) -> tuple[bool, list|None, dict|None, dict|None]:
     """ Build solver using the given base and additional constraints, and run
 
     Args:
@@ -198,21 +264,86 @@ def solve(base: Callable, constraints: list, puzzle: list, seed: int|None = None
         constraints (list): Additional constraints to be added on top of the base
         puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
         seed (int | None, optional): Seed for this solver. Defaults to None.
+        warm_start (bool, optional): Flag to seed the solver with a heuristic coloring. Defaults to False.
+        fallback (Callable | None, optional): Base solver to be used when the native solver exceeds its node budget. Defaults to lazy.
+        simple_solver (bool, optional): Flag to use the plain SMT solver, always used with a warm start. Defaults to False.
 
     Returns:
         tuple[bool, list|None, dict|None, dict|None]: Tuple consisting of a Boolean to indicate a timeout, a solution grid and two dicts of statistics
     """
+    if base == native:
+        result = native_solver.solve(puzzle)
+        if result is not None:
+            return result
+        # The native search exceeded its node budget, the constraints are added on top of the fallback instead
+        base = fallback if fallback is not None else lazy
+
     n = len(puzzle)
-    s, colored, encoding_size = _init_solver(n, seed)
+    s, colored, encoding_size = _init_solver(n, seed, warm_start or simple_solver)
     base(s, colored, puzzle, n, encoding_size)
     for constraint in constraints:
         constraint(s, colored, puzzle, n, encoding_size)
-    
+    if warm_start:
+        _warm_start(s, colored, puzzle, n, base)
+
     if base == lazy:
         return _solve_lazy(s, colored, puzzle, n, encoding_size)
     return _solve(s, colored, puzzle, n, encoding_size)
 
 
+def check_unique(base: Callable, constraints: list, puzzle: list, seed: int|None = None, simple_solver: bool = False) -> tuple[bool, bool, bool]:
+    """ Checks if a puzzle has a solution and if that solution is unique by enumerating up to two models
+
+    Args:
+        base (Callable): Base solver to be used, the native base is checked using the lazy base
+        constraints (list): Additional constraints to be added on top of the base, these should not remove valid solutions
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        seed (int | None, optional): Seed for this solver. Defaults to None.
+        simple_solver (bool, optional): Flag to use the plain SMT solver instead of the default combined solver. Defaults to False.
+
+    Returns:
+        tuple[bool, bool, bool]: Tuple containing a Boolean to indicate a solution was found, a Boolean to indicate it is unique
+            and a Boolean to indicate a timeout, in which case uniqueness is unknown and reported as False
+    """
+    # The native base adds no assertions, so it only makes sense together with the connectivity cuts of the lazy base
+    if base == native:
+        base = lazy
+
+    n = len(puzzle)
+    s, colored, encoding_size = _init_solver(n, seed, simple_solver)
+    base(s, colored, puzzle, n, encoding_size)
+    for constraint in constraints:
+        constraint(s, colored, puzzle, n, encoding_size)
+
+    start = time.perf_counter()
+    models = 0
+    while models < 2:
+        if time.perf_counter()-start >= TIMEOUT/1000:
+            return models > 0, False, True
+        
+        result = s.check()
+        if result == unsat:
+            break
+        # Solver timed out
+        if result == unknown:
+            return models > 0, False, True
+
+        m = s.model()
+        sat_model = [[z3.is_true(m.evaluate(colored[r][c])) for c in range(n)] for r in range(n)]
+
+        # The lazy base can return disconnected models, these are cut and do not count as a solution
+        if base == lazy:
+            components = bitboard.components(bitboard.full_mask(n) & ~bitboard.from_matrix(sat_model, n), n)
+            if len(components) > 1:
+                _add_constraint_connectivity_cut(s, components[1], colored, n)
+                continue
+
+        # Block this coloring so the next check has to find a different solution
+        models += 1
+        s.add(Or([Not(colored[i][j]) if sat_model[i][j] else colored[i][j] for i in range(n) for j in range(n)]))
+    return models > 0, models == 1, False
+
+
 def qf_ia(s: Solver, colored: list, puzzle: list, n: int, encoding_size: dict) -> None:
     """ Solver base using Linear Integer Arithmetic (QF_IA)
 
@@ -314,4 +445,18 @@ def lazy(s: Solver, colored: list, puzzle: list, n: int, encoding_size: dict) ->
         encoding_size (dict): Variable counts for this encoding
     """
     z3solver_base.uniqueness_pairs(s, colored, puzzle, n, encoding_size)
-    z3solver_base.neighbours(s, colored, puzzle, n, encoding_size)
\ No newline at end of file
+    z3solver_base.neighbours(s, colored, puzzle, n, encoding_size)
+
+
+def native(s: Solver, colored: list, puzzle: list, n: int, encoding_size: dict) -> None:
+    """ Solver base using the native backtracking solver, which does not add any assertions.
+    The puzzle is solved without z3 unless the native solver exceeds its node budget
+
+    Args:
+        s (Solver): Solver to add assertions to
+        colored (list): Matrix of BoolRef values for solver to fill
+        puzzle (list): Matrix of Integers representing the number grid of the puzzle instance
+        n (int): Size of the puzzle
+        encoding_size (dict): Variable counts for this encoding
+    """
+    return
@@ -0,0 +1,245 @@
+from functools import lru_cache
+
+# Grids are represented as Python integers where cell (i, j) of an n x n grid is stored in bit i*n+j
+
+@lru_cache(maxsize=None)
+def _masks(n: int) -> tuple[int, int, int]:
+    """ Masks of the full grid, the leftmost column and the rightmost column
+
+    Args:
+        n (int): Size of the grid
+
+    Returns:
+        tuple[int, int, int]: Tuple containing the full, left column and right column masks
+    """
+    full = (1 << (n*n))-1
+    left = sum(1 << (i*n) for i in range(n))
+    right = left << (n-1)
+    return full, left, right
+
+def row_mask(i: int, n: int) -> int:
+    """ Mask of a single row of the grid
+
+    Args:
+        i (int): Index of the row
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard with all cells of the row set
+    """
+    return ((1 << n)-1) << (i*n)
+
+def col_mask(j: int, n: int) -> int:
+    """ Mask of a single column of the grid
+
+    Args:
+        j (int): Index of the column
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard with all cells of the column set
+    """
+    return _masks(n)[1] << j
+
+def full_mask(n: int) -> int:
+    """ Mask of the entire grid
+
+    Args:
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard with all cells set
+    """
+    return _masks(n)[0]
+
+def bit(i: int, j: int, n: int) -> int:
+    """ Bitboard of a single cell
+
+    Args:
+        i (int): Row of the cell
+        j (int): Column of the cell
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard with only this cell set
+    """
+    return 1 << (i*n+j)
+
+def from_matrix(matrix: list, n: int) -> int:
+    """ Converts a matrix of truthy values to a bitboard
+
+    Args:
+        matrix (list): Matrix (or 2D array) of values, truthy values are set in the bitboard
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard of the truthy cells
+    """
+    board = 0
+    for i in range(n):
+        row = matrix[i]
+        for j in range(n):
+            if row[j]:
+                board |= 1 << (i*n+j)
+    return board
+
+def cells(board: int, n: int) -> list:
+    """ Lists the cells that are set in a bitboard
+
+    Args:
+        board (int): Bitboard to list the cells of
+        n (int): Size of the grid
+
+    Returns:
+        list: List of (row, column) tuples in row-major order
+    """
+    result = []
+    while board:
+        low = board & -board
+        result.append(divmod(low.bit_length()-1, n))
+        board ^= low
+    return result
+
+def neighbours(board: int, n: int) -> int:
+    """ Orthogonal neighbours of all cells in a bitboard
+
+    Args:
+        board (int): Bitboard of cells
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard of all cells orthogonally adjacent to a cell in the board
+    """
+    full, left, right = _masks(n)
+    return (((board << 1) & ~left) | ((board >> 1) & ~right) | (board << n) | (board >> n)) & full
+
+def flood_fill(seed: int, mask: int, n: int, target: int = 0) -> int:
+    """ Grows the seed within the mask using shift-based dilation until a fixpoint is reached
+
+    Args:
+        seed (int): Bitboard of the starting cell(s)
+        mask (int): Bitboard of the cells that can be visited
+        n (int): Size of the grid
+        target (int, optional): Stop early as soon as all of these cells are reached. Defaults to 0.
+
+    Returns:
+        int: Bitboard of all visited cells
+    """
+    filled = seed & mask
+    while True:
+        grown = (filled | neighbours(filled, n)) & mask
+        if grown == filled or (target and grown & target == target):
+            return grown
+        filled = grown
+
+def components(mask: int, n: int) -> list:
+    """ Finds all groups of orthogonally connected cells in a bitboard
+
+    Args:
+        mask (int): Bitboard of the cells
+        n (int): Size of the grid
+
+    Returns:
+        list: List of bitboards, one per component, ordered by their first cell in row-major order
+    """
+    result = []
+    while mask:
+        component = flood_fill(mask & -mask, mask, n)
+        result.append(component)
+        mask &= ~component
+    return result
+
+def adjacent_violations(board: int, n: int) -> int:
+    """ Finds cells that have an orthogonal neighbour to the right or below within the same bitboard
+
+    Args:
+        board (int): Bitboard of the cells, usually the colored cells
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard of the cells violating the neighbours rule, 0 if there are none
+    """
+    _, _, right = _masks(n)
+    return board & (((board >> 1) & ~right) | (board >> n))
+
+def value_boards(grid: list, n: int, mask: int|None = None) -> dict:
+    """ Splits a grid of numbers into one bitboard per number
+
+    Args:
+        grid (list): Matrix of numbers
+        n (int): Size of the grid
+        mask (int | None, optional): Only include cells set in this bitboard. Defaults to None.
+
+    Returns:
+        dict: Dictionary mapping each number to the bitboard of cells that contain it
+    """
+    boards = {}
+    for i in range(n):
+        row = grid[i]
+        for j in range(n):
+            b = 1 << (i*n+j)
+            if mask is not None and not mask & b:
+                continue
+            boards[row[j]] = boards.get(row[j], 0) | b
+    return boards
+
+def duplicate_masks(boards: dict, n: int) -> tuple[int, int]:
+    """ Finds all cells whose number occurs more than once within their row and within their column
+
+    Args:
+        boards (dict): Bitboard per number, as created by value_boards
+        n (int): Size of the grid
+
+    Returns:
+        tuple[int, int]: Bitboards of the cells duplicated in their row and of the cells duplicated in their column
+    """
+    rows = [row_mask(i, n) for i in range(n)]
+    cols = [col_mask(j, n) for j in range(n)]
+    row_duplicates = 0
+    col_duplicates = 0
+    for board in boards.values():
+        # A board with less than two cells can not contain duplicates
+        if board & (board-1) == 0:
+            continue
+        for mask in rows:
+            b = board & mask
+            if b & (b-1):
+                row_duplicates |= b
+        for mask in cols:
+            b = board & mask
+            if b & (b-1):
+                col_duplicates |= b
+    return row_duplicates, col_duplicates
+
+def equal_right(boards: dict, n: int) -> int:
+    """ Finds all cells whose right neighbour contains the same number
+
+    Args:
+        boards (dict): Bitboard per number, as created by value_boards
+        n (int): Size of the grid
+
+    Returns:
+        int: Bitboard of the cells equal to their right neighbour
+    """
+    _, _, right = _masks(n)
+    equal = 0
+    for board in boards.values():
+        equal |= board & (board >> 1)
+    return equal & ~right
+
+def runs(board: int) -> list:
+    """ Splits a bitboard into runs of consecutive set bits
+
+    Args:
+        board (int): Bitboard to split
+
+    Returns:
+        list: List of (lowest bit index, length) tuples for every run
+    """
+    result = []
+    while board:
+        low = board & -board
+        run = ((board+low) ^ board) & board
+        result.append((low.bit_length()-1, run.bit_count()))
+        board &= ~run
+    return result
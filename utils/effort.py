@@ -0,0 +1,24 @@
+import math
+
+# Weights of the solver statistics in the effort score
+EFFORT_WEIGHTS = {
+    "decisions": 1.0,
+    "conflicts": 0.7,
+    "propagations": 0.5,
+}
+
+def effort_score(r: dict, weights: dict = EFFORT_WEIGHTS) -> float:
+    """ Calculates an effort based score for the results
+
+    Args:
+        r (dict): Results from the experiments
+        weights (dict, optional): Dict of weights for the effort statistics. Defaults to EFFORT_WEIGHTS.
+
+    Returns:
+        float: Effort score which is a weighted sum of statistics
+    """
+    return (
+        weights["decisions"]*math.log1p(r["statistics"]["decisions"])+
+        weights["conflicts"]*math.log1p(r["statistics"]["conflicts"])+
+        weights["propagations"]*math.log1p(r["statistics"]["propagations"])
+    )
@@ -1,9 +1,32 @@
 import os
 import sys
 import csv
+import json
+import struct
+import pickle
+import atexit
+import numpy as np
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 
 PUZZLE_EXTENSIONS = [".singles"]
 SOLUTION_EXTENSIONS = [".singlessol"]
+PACK_EXTENSIONS = [".singlespack"]
+# Magic bytes at the start of a packed corpus, followed by the length of the JSON index
+PACK_MAGIC = b"SNGLPACK"
+# Path to the cache of parsed puzzle files, keyed by absolute path, modification time and size
+# It is kept in the repository root, so every run shares it regardless of the working directory
+PARSE_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".parse_cache.pkl")
+# Name of the store of rq3 puzzle features, kept next to the puzzles of a corpus
+FEATURE_STORE_NAME = ".features.json"
+# Metadata files that can be stored next to the puzzles, which the directory readers skip
+SIDECAR_NAMES = [FEATURE_STORE_NAME, os.path.basename(PARSE_CACHE)]
+# Minimum number of uncached files before a directory is parsed in a process pool
+PARALLEL_PARSE_THRESHOLD = 256
+
+# Parsed puzzle files of this process, loaded from the parse cache on first use
+_parse_cache = None
+_parse_cache_dirty = False
 
 def _is_puzzle(path: str) -> bool:
     """ Finds out if the path is to a puzzle file by checking the extension
@@ -29,6 +52,122 @@ def _is_solution(path: str) -> bool:
     _, ext = os.path.splitext(path)
     return ext.lower() in SOLUTION_EXTENSIONS
 
+def _is_pack(path: str) -> bool:
+    """ Finds out if the path is to a packed corpus by checking the extension
+
+    Args:
+        path (str): Path to the file
+
+    Returns:
+        bool: True if the path is a packed corpus
+    """
+    _, ext = os.path.splitext(path)
+    return ext.lower() in PACK_EXTENSIONS
+
+def _split_pack_path(path: str) -> tuple[str, str]|None:
+    """ Splits a path to a puzzle inside a packed corpus, e.g. corpus.singlespack/5x5/name.singles
+
+    Args:
+        path (str): Path to the puzzle
+
+    Returns:
+        tuple[str, str]|None: Tuple containing the path to the pack and the name of the puzzle in the pack, or None if the path is not inside a pack
+    """
+    parts = os.path.normpath(path).split(os.sep)
+    for i in range(len(parts)-1, 0, -1):
+        pack = os.sep.join(parts[:i])
+        if _is_pack(pack) and os.path.isfile(pack):
+            return pack, "/".join(parts[i:])
+    return None
+
+@lru_cache(maxsize=8)
+def _load_pack(path: str, mtime: float) -> tuple[dict, dict]:
+    """ Loads a packed corpus with a single sequential read
+
+    Args:
+        path (str): Path to the packed corpus
+        mtime (float): Modification time of the pack, so a changed pack is not served from the cache
+
+    Returns:
+        tuple[dict, dict]: Tuple containing the index of the pack and a dict mapping every puzzle name to its grid and seed
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(PACK_MAGIC)] != PACK_MAGIC:
+        sys.exit(f"Error: Not a packed corpus at {path}")
+    (length,) = struct.unpack_from("<I", data, len(PACK_MAGIC))
+    start = len(PACK_MAGIC)+4
+    index = json.loads(data[start:start+length])
+    start += length
+
+    puzzles = {}
+    for entry in index["puzzles"]:
+        n = entry["size"]
+        grid = np.frombuffer(data, dtype=entry["dtype"], count=n*n, offset=start+entry["offset"]).reshape(n, n)
+        puzzles[entry["name"]] = (grid.tolist(), entry["seed"])
+    return index, puzzles
+
+def puzzle_source(path: str) -> str:
+    """ Finds the file on disk that holds a puzzle, which is the packed corpus for puzzles inside a pack
+
+    Args:
+        path (str): Path to the puzzle
+
+    Returns:
+        str: Path to the puzzle file or packed corpus
+    """
+    if os.path.isfile(path):
+        return path
+    split = _split_pack_path(path)
+    return split[0] if split else path
+
+def read_pack(path: str) -> list:
+    """ Read all puzzles from a packed corpus
+
+    Args:
+        path (str): Path to the packed corpus
+
+    Returns:
+        list: List of tuples containing puzzle information, with paths pointing inside the pack
+    """
+    if not os.path.isfile(path):
+        sys.exit(f"Error: File does not exist at {path}")
+    _, puzzles = _load_pack(path, os.path.getmtime(path))
+    return [(os.path.join(path, name), grid, seed) for name, (grid, seed) in puzzles.items()]
+
+def write_pack(path: str, puzzles: list) -> None:
+    """ Write puzzles to a packed corpus, ordered and indexed by size and name
+
+    Args:
+        path (str): Path of the packed corpus
+        puzzles (list): List of tuples containing the name, grid and seed of every puzzle, names are paths within the pack like 5x5/name.singles
+    """
+    names = [name for name, _, _ in puzzles]
+    if len(set(names)) != len(names):
+        sys.exit(f"Error: Duplicate puzzle names in packed corpus {path}")
+    entries = sorted(((len(grid), name, grid, seed) for name, grid, seed in puzzles), key=lambda e: (e[0], e[1]))
+
+    index = {"sizes": {}, "puzzles": []}
+    chunks = []
+    offset = 0
+    for i, (n, name, grid, seed) in enumerate(entries):
+        # Numbers are at most n, so small grids fit in a byte per cell
+        dtype = "<u1" if n < 256 else "<u2"
+        chunk = np.asarray(grid, dtype=dtype).tobytes()
+        first, count = index["sizes"].get(str(n), (i, 0))
+        index["sizes"][str(n)] = (first, count+1)
+        index["puzzles"].append({"name": name, "size": n, "dtype": dtype, "offset": offset, "seed": seed})
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    header = json.dumps(index).encode()
+    with open(path, "wb") as f:
+        f.write(PACK_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for chunk in chunks:
+            f.write(chunk)
+
 def _parse_file(path: str) -> tuple[list, str|None]:
     """ Extracts the grid and seed from a file.
 
@@ -77,6 +216,80 @@ def _parse_file(path: str) -> tuple[list, str|None]:
     
     return grid, seed
 
+def _load_parse_cache() -> dict:
+    """ Loads the parse cache of this process from disk on first use
+
+    Returns:
+        dict: Dict mapping absolute paths to their modification time, size, puzzle size, packed grid and seed
+    """
+    global _parse_cache
+    if _parse_cache is None:
+        _parse_cache = {}
+        if os.path.exists(PARSE_CACHE):
+            try:
+                with open(PARSE_CACHE, "rb") as f:
+                    _parse_cache = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                print(f"Warning: Ignoring unreadable parse cache at {PARSE_CACHE}")
+    return _parse_cache
+
+def _save_parse_cache() -> None:
+    """ Writes the parse cache to disk if it changed, dropping the entries of files that no longer exist
+        The cache is written to a temporary file that replaces the old one, so concurrent runs never leave a partial file
+    """
+    global _parse_cache_dirty
+    if not _parse_cache_dirty:
+        return
+    for path in [path for path in _parse_cache if not os.path.exists(path)]:
+        del _parse_cache[path]
+
+    temporary = f"{PARSE_CACHE}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            pickle.dump(_parse_cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, PARSE_CACHE)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+    _parse_cache_dirty = False
+
+def _cache_parsed(path: str, key: tuple, grid: list, seed: str|None) -> None:
+    """ Adds a parsed puzzle file to the parse cache, which is written to disk when the process exits
+
+    Args:
+        path (str): Absolute path to the puzzle file
+        key (tuple): Modification time and size of the file
+        grid (list): Parsed grid of the puzzle
+        seed (str | None): Parsed seed of the puzzle
+    """
+    global _parse_cache_dirty
+    if not _parse_cache_dirty:
+        atexit.register(_save_parse_cache)
+    n = len(grid)
+    _load_parse_cache()[path] = (key, n, np.asarray(grid, dtype="<u1" if n < 256 else "<u2").tobytes(), seed)
+    _parse_cache_dirty = True
+
+def _parse_puzzle_cached(path: str) -> tuple[list, str|None]:
+    """ Extracts the grid and seed from a puzzle file, using the parse cache if the file did not change
+
+    Args:
+        path (str): Path to the puzzle file
+
+    Returns:
+        tuple[list, str|None]: Tuple containing the grid and the seed of the puzzle
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    entry = _load_parse_cache().get(path)
+    if entry is not None and entry[0] == key:
+        _, n, data, seed = entry
+        return np.frombuffer(data, dtype="<u1" if n < 256 else "<u2").reshape(n, n).tolist(), seed
+
+    grid, seed = _parse_file(path)
+    _cache_parsed(path, key, grid, seed)
+    return grid, seed
+
 def _read_file(path: str, puzzles: bool, strict: bool) -> list:
     """ Reads a file
 
@@ -88,6 +301,15 @@ def _read_file(path: str, puzzles: bool, strict: bool) -> list:
     Returns:
         list: List containing a single tuple of the file that was read
     """
+    if puzzles and not os.path.exists(path):
+        member = _split_pack_path(path)
+        if member is not None:
+            pack, name = member
+            _, pack_puzzles = _load_pack(pack, os.path.getmtime(pack))
+            if name not in pack_puzzles:
+                sys.exit(f"Error: No puzzle {name} in packed corpus {pack}")
+            grid, seed = pack_puzzles[name]
+            return [(path, grid, seed)]
     if not os.path.exists(path):
         sys.exit(f"Error: File does not exist at {path}")
     if (puzzles and not _is_puzzle(path)) or (not puzzles and not _is_solution(path)):
@@ -97,35 +319,55 @@ def _read_file(path: str, puzzles: bool, strict: bool) -> list:
             print(f"Warning: Not a {'puzzle' if puzzles else 'solution'} file at {path}")
             return []
 
-    grid, seed = _parse_file(path)
+    grid, seed = _parse_puzzle_cached(path) if puzzles else _parse_file(path)
     return [(path, grid, seed)]
 
-def _read_dir(path: str, puzzles: bool, strict: bool, recursive: bool) -> list:
-    """ Reads a directory
+def _iter_dir(path: str, puzzles: bool, strict: bool, recursive: bool, prefetch=None):
+    """ Iterates over the files of a directory in name order, reading every file only when it is reached
 
     Args:
         path (str): Path to the directory
         puzzles (bool): Flag to indicate whether we want to read puzzle or solution file
         strict (bool): Flag to indicate if we want to exit with an error when the file is not correct
         recursive (bool): Flag to indicate whether we want to look recursively within folders
+        prefetch (Callable | None, optional): Called with the path of every file before it is read. Defaults to None.
 
-    Returns:
-        list: List of tuples containing puzzle or solution file data
+    Yields:
+        tuple: Tuple containing the path, grid and seed of a puzzle or solution file
     """
     if not os.path.isdir(path):
         sys.exit(f"Error: Not a directory at {path}")
 
-    grids = []
-    for filename in os.listdir(path):
-        file = os.path.join(path, filename)
-
-        if not os.path.isfile(file):
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    for entry in entries:
+        if not entry.is_file():
             if recursive:
-                grids.extend(_read_dir(file, puzzles, strict, recursive))
+                yield from _iter_dir(entry.path, puzzles, strict, recursive, prefetch)
+            continue
+        if entry.name in SIDECAR_NAMES:
+            continue
+
+        if puzzles and _is_pack(entry.path):
+            yield from read_pack(entry.path)
             continue
+        if prefetch is not None:
+            prefetch(entry.path)
+        yield from _read_file(entry.path, puzzles, strict)
+
+def _read_dir(path: str, puzzles: bool, strict: bool, recursive: bool) -> list:
+    """ Reads a directory
 
-        grids.extend(_read_file(file, puzzles, strict))
-    return grids
+    Args:
+        path (str): Path to the directory
+        puzzles (bool): Flag to indicate whether we want to read puzzle or solution file
+        strict (bool): Flag to indicate if we want to exit with an error when the file is not correct
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+
+    Returns:
+        list: List of tuples containing puzzle or solution file data
+    """
+    return list(_iter_dir(path, puzzles, strict, recursive))
 
 def _flatten_dict(dictionary: dict, parent_key: str = "", seperator: str = ".") -> dict:
     """ Flatten a dictionary into a single layer instead from nested dictionaries
@@ -221,6 +463,73 @@ def read_solution(path: str, strict: bool) -> tuple[str, list, str]:
         sys.exit(f"Error: No solution file found at {path}")
     return result[0]
 
+def _uncached_puzzles(path: str, recursive: bool) -> list:
+    """ Lists the puzzle files in a directory that are not in the parse cache yet, without reading them
+
+    Args:
+        path (str): Path to the directory
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+
+    Returns:
+        list: List of tuples containing the absolute path and the cache key of every uncached file, in name order
+    """
+    if not os.path.isdir(path):
+        return []
+    cache = _load_parse_cache()
+    missing = []
+    for file in list_files(path, recursive, True):
+        file = os.path.abspath(file)
+        st = os.stat(file)
+        key = (st.st_mtime_ns, st.st_size)
+        entry = cache.get(file)
+        if entry is None or entry[0] != key:
+            missing.append((file, key))
+    return missing
+
+def iter_puzzle_dir(path: str, recursive: bool, strict: bool):
+    """ Iterate over a puzzle directory, parsing every puzzle only when it is reached
+        Large directories with many uncached files are parsed ahead in a process pool, and every puzzle is yielded
+        as soon as its result arrives, so the first puzzle does not wait for the rest of the directory
+
+    Args:
+        path (str): Path to the puzzle directory
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+        strict (bool): Flag to indicate if we want to exit with an error when the file is not correct
+
+    Yields:
+        tuple: Tuple containing puzzle information
+    """
+    missing = _uncached_puzzles(path, recursive)
+    executor = None
+    prefetch = None
+    if len(missing) >= PARALLEL_PARSE_THRESHOLD:
+        executor = ProcessPoolExecutor()
+        # The results arrive in the name order of the files, which is the order in which the directory is read
+        parsed = zip(missing, executor.map(_parse_file, [file for file, _ in missing], chunksize=64))
+        remaining = {file for file, _ in missing}
+
+        def prefetch(file: str) -> None:
+            file = os.path.abspath(file)
+            if file not in remaining:
+                return
+            for (done, key), (grid, seed) in parsed:
+                remaining.discard(done)
+                _cache_parsed(done, key, grid, seed)
+                if done == file:
+                    return
+
+    found = False
+    try:
+        for puzzle in _iter_dir(path, True, strict, recursive, prefetch):
+            found = True
+            yield puzzle
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    _save_parse_cache()
+    if not found:
+        sys.exit(f"Error: No puzzle files found in {path}")
+
 def read_puzzle_dir(path: str, recursive: bool, strict: bool) -> list:
     """ Read a puzzle directory
 
@@ -232,10 +541,25 @@ def read_puzzle_dir(path: str, recursive: bool, strict: bool) -> list:
     Returns:
         list: List of tuples containing puzzle information
     """
-    puzzles = _read_dir(path, True, strict, recursive)
-    if not puzzles:
-        sys.exit(f"Error: No puzzle files found in {path}")
-    return puzzles
+    return list(iter_puzzle_dir(path, recursive, strict))
+
+def iter_solution_dir(path: str, recursive: bool, strict: bool):
+    """ Iterate over a solution directory, reading every solution only when it is reached
+
+    Args:
+        path (str): Path to the solution directory
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+        strict (bool): Flag to indicate if we want to exit with an error when the file is not correct
+
+    Yields:
+        tuple: Tuple containing solution information
+    """
+    found = False
+    for solution in _iter_dir(path, False, strict, recursive):
+        found = True
+        yield solution
+    if not found:
+        sys.exit(f"Error: No solution files found in {path}")
 
 def read_solution_dir(path: str, recursive: bool, strict: bool) -> list:
     """ Read a solution directory
@@ -248,10 +572,58 @@ def read_solution_dir(path: str, recursive: bool, strict: bool) -> list:
     Returns:
         list: List of tuples containing solution information
     """
-    solutions = _read_dir(path, False, strict, recursive)
-    if not solutions:
-        sys.exit(f"Error: No solution files found in {path}")
-    return solutions
+    return list(iter_solution_dir(path, recursive, strict))
+
+def list_files(path: str, recursive: bool, puzzles: bool, packs: bool = False) -> list:
+    """ Lists the puzzle or solution files in a directory in name order without reading them
+
+    Args:
+        path (str): Path to the directory
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+        puzzles (bool): Flag to indicate whether we want to list puzzle or solution files
+        packs (bool, optional): Flag to also list packed corpora when listing puzzle files. Defaults to False.
+
+    Returns:
+        list: List of paths to the files
+    """
+    if not os.path.isdir(path):
+        sys.exit(f"Error: Not a directory at {path}")
+
+    files = []
+    with os.scandir(path) as it:
+        entries = sorted(it, key=lambda entry: entry.name)
+    for entry in entries:
+        if not entry.is_file():
+            if recursive:
+                files.extend(list_files(entry.path, recursive, puzzles, packs))
+        elif (puzzles and (_is_puzzle(entry.path) or (packs and _is_pack(entry.path)))) or (not puzzles and _is_solution(entry.path)):
+            files.append(entry.path)
+    return files
+
+def count_puzzles(path: str, recursive: bool) -> int:
+    """ Counts the puzzles in a directory or packed corpus without parsing the puzzle files
+
+    Args:
+        path (str): Path to the directory or packed corpus
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+
+    Returns:
+        int: Number of puzzles
+    """
+    if _is_pack(path):
+        return len(_load_pack(path, os.path.getmtime(path))[1])
+
+    count = 0
+    with os.scandir(path) as it:
+        for entry in it:
+            if not entry.is_file():
+                if recursive:
+                    count += count_puzzles(entry.path, recursive)
+            elif _is_pack(entry.path):
+                count += count_puzzles(entry.path, recursive)
+            elif _is_puzzle(entry.path):
+                count += 1
+    return count
 
 def write_file(path: str, puzzle: list, seed: str|None, extra: str|None) -> None:
     """ Writes a solution to a file
@@ -314,6 +686,42 @@ def write_csv(results: dict, out_dir: str) -> None:
             for flat in flat_rows:
                 writer.writerow(flat)
 
+def append_csv(result: dict, out_dir: str) -> None:
+    """ Append a single result to the csv file of its solver, writing the header if the file is new
+        When the result has columns the file does not have yet, the file is rewritten with the extended header
+
+    Args:
+        result (dict): Single result from an experiment
+        out_dir (str): Directory to write to
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    out_path = os.path.join(out_dir, f"{result['solver']}.csv")
+    flat = _flatten_dict(result)
+
+    if not os.path.exists(out_path):
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=sorted(flat.keys()))
+            writer.writeheader()
+            writer.writerow(flat)
+        return
+
+    with open(out_path, "r", newline="", encoding="utf-8") as f:
+        fieldnames = next(csv.reader(f))
+
+    if not set(flat.keys()) <= set(fieldnames):
+        # Earlier results, e.g. timeouts, can miss columns, so the header is extended instead of dropping the new columns
+        with open(out_path, "r", newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        fieldnames = sorted(set(fieldnames) | set(flat.keys()))
+        with open(out_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    with open(out_path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writerow(flat)
+
 def read_csv(path: str) -> dict:
     """ Read a csv file
 
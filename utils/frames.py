@@ -0,0 +1,262 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Fixed schema of a result frame, the columns are named after the flattened columns of the csv files
+RESULT_SCHEMA = {
+    "run": "Int64",
+    "puzzle": str,
+    "path": str,
+    "size": "int64",
+    "solver": str,
+    "seed": "Int64",
+    "runs": "Int64",
+    "statistics.runtime": "float64",
+    "statistics.wall_time": "float64",
+    "statistics.cpu_time": "float64",
+    "statistics.timed_out": "Int64",
+    "statistics.budget": "float64",
+    "statistics.propagations": "float64",
+    "statistics.rlimit_count": "float64",
+    "statistics.conflicts": "float64",
+    "statistics.decisions": "float64",
+    "statistics.memory": "float64",
+    "statistics.max_memory": "float64",
+    "statistics.encoding_size.int_vars": "float64",
+    "statistics.encoding_size.bool_vars": "float64",
+    "statistics.encoding_size.bv_vars": "float64",
+    "statistics.encoding_size.assertions": "float64",
+    "puzzle_statistics.black_cells": "Int64",
+}
+# Columns counting the variables of the encoding
+VARIABLE_COLUMNS = ["statistics.encoding_size.int_vars", "statistics.encoding_size.bool_vars", "statistics.encoding_size.bv_vars"]
+# Columns of the encoding size
+ENCODING_COLUMNS = VARIABLE_COLUMNS + ["statistics.encoding_size.assertions"]
+# Columns identifying the runs of the same puzzle by the same solver
+PUZZLE_KEY = ["solver", "size", "puzzle"]
+# Solver statistics of which the analyses use the median over the runs, next to every encoding size
+MEDIAN_STATISTICS = ["runtime", "decisions", "conflicts", "propagations"]
+
+def _typed(frame: pd.DataFrame) -> pd.DataFrame:
+    """ Apply the result schema to a frame, adding missing columns as empty columns
+
+    Args:
+        frame (pd.DataFrame): Frame with (a subset of) the columns of the schema
+
+    Returns:
+        pd.DataFrame: Frame with exactly the columns of the schema
+    """
+    for column, dtype in RESULT_SCHEMA.items():
+        if column not in frame:
+            frame[column] = pd.Series(index=frame.index, dtype=dtype)
+    return frame[list(RESULT_SCHEMA)].astype(RESULT_SCHEMA)
+
+def read_csv_frame(path: str) -> pd.DataFrame:
+    """ Read a csv file of results directly into a typed frame
+
+    Args:
+        path (str): Csv file to be read
+
+    Returns:
+        pd.DataFrame: Results read from the csv file
+    """
+    if not os.path.exists(path):
+        sys.exit(f"Error: File does not exist at {path}")
+
+    dtypes = {column: dtype for column, dtype in RESULT_SCHEMA.items() if dtype != "int64"}
+    frame = pd.read_csv(path, usecols=lambda column: column in RESULT_SCHEMA, dtype=dtypes)
+    return _typed(frame)
+
+def read_csv_folder_frame(path: str, recursive: bool) -> pd.DataFrame:
+    """ Read an entire folder of csv files into a single typed frame
+
+    Args:
+        path (str): Csv folder to be read
+        recursive (bool): Flag to indicate whether we want to look recursively within folders
+
+    Returns:
+        pd.DataFrame: Results read from the csv folder
+    """
+    if not os.path.isdir(path):
+        sys.exit(f"Error: Not a directory at {path}")
+
+    frames = []
+    for filename in os.listdir(path):
+        file = os.path.join(path, filename)
+
+        if not os.path.isfile(file):
+            if recursive:
+                frames.append(read_csv_folder_frame(file, recursive))
+            continue
+
+        frames.append(read_csv_frame(file))
+    if not frames:
+        return _typed(pd.DataFrame())
+    return pd.concat(frames, ignore_index=True)
+
+def results_frame(results: list|pd.DataFrame) -> pd.DataFrame:
+    """ Convert a list of nested results to a typed frame, frames are returned as is
+
+    Args:
+        results (list | pd.DataFrame): Results from the experiments
+
+    Returns:
+        pd.DataFrame: Results as a typed frame
+    """
+    if isinstance(results, pd.DataFrame):
+        return results
+
+    columns = {}
+    for column in RESULT_SCHEMA:
+        location = column.split(".")
+        values = []
+        for r in results:
+            value = r
+            for key in location:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value)
+        columns[column] = values
+    return _typed(pd.DataFrame(columns))
+
+def encoding_variables(frame: pd.DataFrame) -> pd.Series:
+    """ Count the variables of the encoding of every result
+
+    Args:
+        frame (pd.DataFrame): Results from the experiments
+
+    Returns:
+        pd.Series: Total number of variables per result
+    """
+    return frame[VARIABLE_COLUMNS].sum(axis=1)
+
+def encoding_total(frame: pd.DataFrame) -> pd.Series:
+    """ Count the total encoding size of every result
+
+    Args:
+        frame (pd.DataFrame): Results from the experiments
+
+    Returns:
+        pd.Series: Number of variables and assertions per result
+    """
+    return frame[ENCODING_COLUMNS].sum(axis=1)
+
+def median_per_puzzle(frame: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """ Flatten the runs of every puzzle and solver into a single row
+        The given columns are the medians over the runs, the other columns are those of the first run
+
+    Args:
+        frame (pd.DataFrame): Results from the experiments
+        columns (list): Columns to take the median of
+
+    Returns:
+        pd.DataFrame: One row per puzzle and solver, in order of first appearance
+    """
+    grouped = frame.groupby(PUZZLE_KEY, sort=False)
+    flattened = grouped.nth(0).reset_index(drop=True)
+    medians = grouped[columns].median().reset_index(drop=True)
+    flattened[columns] = medians.astype("float64")
+    return flattened
+
+def aggregate_runs(results) -> list:
+    """ Fold the runs of every puzzle and solver into a single summary record in one pass over the results
+        The input records are not copied, only the values needed for the medians are collected
+
+    Args:
+        results (iterable): Results from the experiments, any iterable of results
+
+    Returns:
+        list: One record per puzzle and solver, in order of first appearance, with the median of MEDIAN_STATISTICS and of
+            every encoding size in "statistics" and the number of runs in "runs"
+    """
+    groups = {}
+    for r in results:
+        key = (r["solver"], r["size"], r["puzzle"])
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = (r, {name: [] for name in MEDIAN_STATISTICS}, {}, [0])
+        _, values, encoding, runs = group
+        runs[0] += 1
+
+        statistics = r["statistics"]
+        for name in MEDIAN_STATISTICS:
+            value = statistics.get(name)
+            if value is not None:
+                values[name].append(value)
+        for name, value in statistics.get("encoding_size", {}).items():
+            encoding.setdefault(name, []).append(value)
+
+    flattened = []
+    for first, values, encoding, runs in groups.values():
+        statistics = {name: float(np.median(v)) if v else 0.0 for name, v in values.items()}
+        statistics["encoding_size"] = {name: float(np.median(v)) for name, v in encoding.items()}
+        flattened.append({
+            "solver": first["solver"],
+            "size": first["size"],
+            "path": first["path"],
+            "puzzle": first["puzzle"],
+            "puzzle_statistics": first.get("puzzle_statistics"),
+            "runs": runs[0],
+            "statistics": statistics
+        })
+    return flattened
+
+def rescore_frame(frame: pd.DataFrame, multiplier: float, default_budget: float, cutoff: float|None = None) -> pd.DataFrame:
+    """ Recompute the penalised runtime of every result from its raw outcome, without solving again
+        Results without raw outcomes use their runtime as the raw time, the default budget as budget and
+        count as timed out when the runtime reaches the budget
+
+    Args:
+        frame (pd.DataFrame): Results as read from a csv file, the other columns are kept as is
+        multiplier (float): Penalty multiplier k, a timed out result scores k times the budget
+        default_budget (float): Budget in seconds for results without a stored budget
+        cutoff (float | None, optional): Lower budget in seconds, results at or above it count as timed out. Defaults to None.
+
+    Returns:
+        pd.DataFrame: Frame with the rescored runtime, the raw outcome columns and the applied budget
+    """
+    def numeric(column: str) -> pd.Series:
+        if column not in frame:
+            return pd.Series(np.nan, index=frame.index)
+        return pd.to_numeric(frame[column], errors="coerce")
+
+    runtime = numeric("statistics.runtime")
+    raw = numeric("statistics.wall_time").fillna(runtime)
+    budget = numeric("statistics.budget").fillna(default_budget)
+    timed_out = numeric("statistics.timed_out")
+    timed_out = timed_out.where(timed_out.notna(), raw >= budget).astype(bool)
+
+    if cutoff is not None:
+        lowered = np.minimum(budget, cutoff)
+        timed_out |= (lowered < budget) & (raw >= lowered)
+        budget = lowered
+
+    frame = frame.copy()
+    frame["statistics.runtime"] = np.where(timed_out, budget*multiplier, raw)
+    frame["statistics.timed_out"] = timed_out.astype(int)
+    frame["statistics.budget"] = budget
+    return frame
+
+def rescore_csv(path: str, out_path: str, multiplier: float, default_budget: float, cutoff: float|None = None) -> int:
+    """ Rescore a csv file of results and write it in the layout of write_csv
+
+    Args:
+        path (str): Csv file to be rescored
+        out_path (str): Csv file to write to
+        multiplier (float): Penalty multiplier k, a timed out result scores k times the budget
+        default_budget (float): Budget in seconds for results without a stored budget
+        cutoff (float | None, optional): Lower budget in seconds, results at or above it count as timed out. Defaults to None.
+
+    Returns:
+        int: Number of results that count as timed out after rescoring
+    """
+    if not os.path.exists(path):
+        sys.exit(f"Error: File does not exist at {path}")
+
+    # Read every column as text, so the columns that are not rescored are written back unchanged
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    frame = rescore_frame(frame, multiplier, default_budget, cutoff)
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    # Same line endings as the csv module used by write_csv
+    frame[sorted(frame.columns)].to_csv(out_path, index=False, lineterminator="\r\n")
+    return int(frame["statistics.timed_out"].sum())
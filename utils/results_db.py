@@ -0,0 +1,224 @@
+import os
+import sys
+import sqlite3
+import numpy as np
+from utils.file_utils import read_csv, read_csv_folder, write_csv
+
+# Default path to the results database
+RESULTS_DB = os.path.abspath("results.db")
+# Typed columns of a result, mapped to their location in the nested result dict
+COLUMNS = {
+    "run": ("INTEGER", ("run",)),
+    "puzzle": ("TEXT NOT NULL", ("puzzle",)),
+    "path": ("TEXT NOT NULL", ("path",)),
+    "size": ("INTEGER NOT NULL", ("size",)),
+    "solver": ("TEXT NOT NULL", ("solver",)),
+    "seed": ("INTEGER", ("seed",)),
+    "runs": ("INTEGER", ("runs",)),
+    "runtime": ("REAL", ("statistics", "runtime")),
+    "wall_time": ("REAL", ("statistics", "wall_time")),
+    "cpu_time": ("REAL", ("statistics", "cpu_time")),
+    "timed_out": ("INTEGER", ("statistics", "timed_out")),
+    "budget": ("REAL", ("statistics", "budget")),
+    "propagations": ("INTEGER", ("statistics", "propagations")),
+    "rlimit_count": ("INTEGER", ("statistics", "rlimit_count")),
+    "conflicts": ("INTEGER", ("statistics", "conflicts")),
+    "decisions": ("INTEGER", ("statistics", "decisions")),
+    "memory": ("REAL", ("statistics", "memory")),
+    "max_memory": ("REAL", ("statistics", "max_memory")),
+    "int_vars": ("INTEGER", ("statistics", "encoding_size", "int_vars")),
+    "bool_vars": ("INTEGER", ("statistics", "encoding_size", "bool_vars")),
+    "bv_vars": ("INTEGER", ("statistics", "encoding_size", "bv_vars")),
+    "assertions": ("INTEGER", ("statistics", "encoding_size", "assertions")),
+    "black_cells": ("INTEGER", ("puzzle_statistics", "black_cells")),
+}
+# Columns identifying a single result, a result with the same key replaces the stored one
+KEY_COLUMNS = ["solver", "path", "run"]
+# Columns of which the median is taken when grouping the runs of a puzzle
+MEDIAN_COLUMNS = ["runtime", "wall_time", "cpu_time", "propagations", "rlimit_count", "conflicts", "decisions", "memory", "max_memory", "int_vars", "bool_vars", "bv_vars", "assertions"]
+
+class _Median:
+    """ SQLite aggregate for the median of a group, matching np.median """
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return float(np.median(self.values)) if self.values else None
+
+def connect(path: str = RESULTS_DB) -> sqlite3.Connection:
+    """ Open the results database, creating the schema if needed
+
+    Args:
+        path (str, optional): Path to the database file. Defaults to RESULTS_DB.
+
+    Returns:
+        sqlite3.Connection: Connection to the database with the median aggregate registered
+    """
+    conn = sqlite3.connect(path)
+    conn.create_aggregate("median", 1, _Median)
+    columns = ", ".join(f"{name} {sql_type}" for name, (sql_type, _) in COLUMNS.items())
+    conn.execute(f"CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, {columns}, UNIQUE ({', '.join(KEY_COLUMNS)}))")
+    # Databases created before a column was added to COLUMNS get the column as an empty column
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+    for name, (sql_type, _) in COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE results ADD COLUMN {name} {sql_type}")
+    conn.execute("CREATE INDEX IF NOT EXISTS results_solver_size_puzzle ON results (solver, size, puzzle)")
+    return conn
+
+def _to_row(result: dict) -> tuple:
+    """ Convert a nested result to a row of the results table
+
+    Args:
+        result (dict): Single result from an experiment
+
+    Returns:
+        tuple: Values in the order of COLUMNS, None for missing values
+    """
+    row = []
+    for _, location in COLUMNS.values():
+        value = result
+        for key in location:
+            value = value.get(key) if isinstance(value, dict) else None
+        row.append(value)
+    return tuple(row)
+
+def _to_result(row: sqlite3.Row) -> dict:
+    """ Convert a row of the results table back to a nested result
+
+    Args:
+        row (sqlite3.Row): Row with (a subset of) the columns of COLUMNS
+
+    Returns:
+        dict: Result in the same shape as produced by the experiments
+    """
+    result = {}
+    for name in row.keys():
+        if name not in COLUMNS or (row[name] is None and name == "runs"):
+            continue
+        target = result
+        location = COLUMNS[name][1]
+        for key in location[:-1]:
+            target = target.setdefault(key, {})
+        target[location[-1]] = row[name]
+    return result
+
+def insert_results(conn: sqlite3.Connection, results: list) -> None:
+    """ Insert results, replacing stored results with the same key
+
+    Args:
+        conn (sqlite3.Connection): Connection to the results database
+        results (list): Results from an experiment
+    """
+    names = list(COLUMNS.keys())
+    updates = ", ".join(f"{name} = excluded.{name}" for name in names if name not in KEY_COLUMNS)
+    with conn:
+        conn.executemany(f"INSERT INTO results ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)}) "
+                         f"ON CONFLICT ({', '.join(KEY_COLUMNS)}) DO UPDATE SET {updates}",
+                         (_to_row(r) for r in results))
+
+def _where(solvers: list|None, sizes: list|None) -> tuple[str, list]:
+    """ Build the filter on solvers and sizes
+
+    Args:
+        solvers (list | None): Solvers to keep, all if None
+        sizes (list | None): Puzzle sizes to keep, all if None
+
+    Returns:
+        tuple[str, list]: WHERE clause and its parameters
+    """
+    clauses = []
+    params = []
+    if solvers is not None:
+        clauses.append(f"solver IN ({', '.join('?' for _ in solvers)})")
+        params.extend(solvers)
+    if sizes is not None:
+        clauses.append(f"size IN ({', '.join('?' for _ in sizes)})")
+        params.extend(sizes)
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+def read_results(path: str, solvers: list|None = None, sizes: list|None = None) -> list:
+    """ Read every stored run from the results database
+
+    Args:
+        path (str): Path to the database file
+        solvers (list | None, optional): Solvers to read, all if None. Defaults to None.
+        sizes (list | None, optional): Puzzle sizes to read, all if None. Defaults to None.
+
+    Returns:
+        list: Results in the same shape as produced by the experiments
+    """
+    if not os.path.exists(path):
+        sys.exit(f"Error: Database does not exist at {path}")
+
+    conn = connect(path)
+    conn.row_factory = sqlite3.Row
+    where, params = _where(solvers, sizes)
+    rows = conn.execute(f"SELECT {', '.join(COLUMNS.keys())} FROM results {where} ORDER BY id", params)
+    results = [_to_result(row) for row in rows]
+    conn.close()
+    return results
+
+def read_grouped_results(path: str, solvers: list|None = None, sizes: list|None = None) -> list:
+    """ Read one result per solver and puzzle, grouping the runs in SQL
+        The solver statistics are the medians over the runs, the other values are those of the first stored run
+
+    Args:
+        path (str): Path to the database file
+        solvers (list | None, optional): Solvers to read, all if None. Defaults to None.
+        sizes (list | None, optional): Puzzle sizes to read, all if None. Defaults to None.
+
+    Returns:
+        list: Grouped results in the same shape as produced by the experiments, with the number of runs in "runs"
+    """
+    if not os.path.exists(path):
+        sys.exit(f"Error: Database does not exist at {path}")
+
+    conn = connect(path)
+    conn.row_factory = sqlite3.Row
+    where, params = _where(solvers, sizes)
+    # With MIN(id) as the only min/max aggregate, the bare columns are taken from the first stored run
+    columns = [f"median({name}) AS {name}" if name in MEDIAN_COLUMNS else name for name in COLUMNS if name != "runs"]
+    rows = conn.execute(f"SELECT MIN(id), COUNT(*) AS runs, {', '.join(columns)} FROM results {where} "
+                        f"GROUP BY solver, size, puzzle ORDER BY MIN(id)", params)
+    results = [_to_result(row) for row in rows]
+    conn.close()
+    return results
+
+def import_csv(path: str, csv_paths: list) -> int:
+    """ Import csv files or folders in the layout of write_csv into the results database
+
+    Args:
+        path (str): Path to the database file
+        csv_paths (list): Paths to csv files or folders of csv files
+
+    Returns:
+        int: Number of imported results
+    """
+    conn = connect(path)
+    count = 0
+    for csv_path in csv_paths:
+        results = read_csv_folder(csv_path, False, True) if os.path.isdir(csv_path) else read_csv(csv_path)
+        insert_results(conn, results)
+        count += len(results)
+    conn.close()
+    return count
+
+def export_csv(path: str, out_dir: str) -> int:
+    """ Export the results database to csv files in the layout of write_csv, one csv per solver
+
+    Args:
+        path (str): Path to the database file
+        out_dir (str): Directory to write to
+
+    Returns:
+        int: Number of exported results
+    """
+    results = read_results(path)
+    write_csv(results, out_dir)
+    return len(results)
@@ -1,3 +1,6 @@
+import math
+
+
 def format_elapsed(elapsed: float) -> str:
     """ Helper function for formatting the elapsed time in ms or s based on value
 
@@ -11,4 +14,47 @@ def format_elapsed(elapsed: float) -> str:
         ms = elapsed*1000
         return f"{ms:.3f} ms"
     else:
-        return f"{elapsed:.3f} s"
\ No newline at end of file
+        return f"{elapsed:.3f} s"
+
+def median_confidence_interval(values: list, confidence: float = 0.95) -> tuple[float, float]:
+    """ Distribution-free confidence interval of the median using order statistics of the binomial distribution
+
+    Args:
+        values (list): Sample to calculate the interval for
+        confidence (float, optional): Confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        tuple[float, float]: Lower and upper bound of the interval, unbounded if the sample is too small for the confidence level
+    """
+    x = sorted(values)
+    m = len(x)
+    alpha = (1-confidence)/2
+
+    # Find the largest rank l such that P(B <= l-1) <= alpha for B ~ Binomial(m, 0.5)
+    l = 0
+    cdf = 0.0
+    for k in range(m//2):
+        cdf += math.comb(m, k)/2**m
+        if cdf > alpha:
+            break
+        l = k+1
+
+    if l == 0:
+        return float("-inf"), float("inf")
+    return float(x[l-1]), float(x[m-l])
+
+def median_confidence_min_runs(confidence: float = 0.95) -> int:
+    """ Smallest sample size for which median_confidence_interval is bounded at the given confidence level
+
+    Args:
+        confidence (float, optional): Confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        int: Minimum number of values, e.g. 6 at a confidence level of 0.95
+    """
+    alpha = (1-confidence)/2
+    # The interval is bounded as soon as the smallest value alone is unlikely enough, P(B <= 0) = 0.5^m <= alpha
+    m = 1
+    while 0.5**m > alpha:
+        m += 1
+    return m